@@ -6,6 +6,9 @@ state CRUD, and evolution logging used across all madness scripts.
 """
 
 import argparse
+import gzip
+import hashlib
+import io
 import json
 import os
 import sys
@@ -13,6 +16,11 @@ import tempfile
 from datetime import date, datetime, timezone
 from pathlib import Path
 
+try:
+    import zstandard
+except ImportError:  # optional: only needed for .jsonl.zst archives
+    zstandard = None
+
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
@@ -168,13 +176,256 @@ def count_facets(project_dir: str) -> int:
 
 
 def count_sessions(project_dir: str) -> int:
-    """Count JSONL session files in the Claude projects directory."""
+    """Count sessions in the Claude projects directory.
+
+    Plain ``.jsonl`` transcripts and ``.jsonl.gz``/``.jsonl.zst`` archives
+    are counted once per session id, as scan_sessions lists them.
+    """
     abs_project = str(Path(project_dir).resolve())
     encoded_name = abs_project.replace("/", "-")
     claude_sessions = Path.home() / ".claude" / "projects" / encoded_name
     if not claude_sessions.is_dir():
         return 0
-    return sum(1 for f in claude_sessions.glob("*.jsonl"))
+    return len({
+        session_id_from_path(f.name)
+        for f in claude_sessions.iterdir()
+        if session_suffix(f) and not f.name.startswith(".") and f.is_file()
+    })
+
+
+# ---------------------------------------------------------------------------
+# Session transcripts (plain or compressed)
+# ---------------------------------------------------------------------------
+
+# Transcript file suffixes; archives are read with streaming decompression
+SESSION_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+
+
+def session_suffix(path) -> str | None:
+    """Return the transcript suffix of *path* (see SESSION_SUFFIXES), or None."""
+    name = os.path.basename(str(path))
+    for suffix in SESSION_SUFFIXES:
+        if name.endswith(suffix):
+            return suffix
+    return None
+
+
+def session_id_from_path(path) -> str:
+    """Session id of a transcript: its file name without the transcript suffix."""
+    name = os.path.basename(str(path))
+    suffix = session_suffix(name)
+    return name[: -len(suffix)] if suffix else Path(name).stem
+
+
+def is_compressed_session(path) -> bool:
+    """True for ``.jsonl.gz``/``.jsonl.zst`` archives."""
+    return session_suffix(path) not in (None, ".jsonl")
+
+
+def open_session(path, mode: str = "rb", errors: str | None = None):
+    """Open a session transcript, decompressing ``.gz``/``.zst`` archives on the fly.
+
+    *mode* is ``"rb"`` (binary stream) or ``"r"`` (UTF-8 text, with
+    *errors* as for open()). Plain ``.jsonl`` files are opened directly.
+    Reading ``.zst`` needs the optional ``zstandard`` package; without it an
+    OSError is raised so callers' existing read-error handling applies.
+    Decompressed streams are forward-only in practice: seeking backwards
+    restarts decompression (gzip) or fails (zstd).
+    """
+    path = str(path)
+    binary = "b" in mode
+    if path.endswith(".gz"):
+        stream = gzip.open(path, "rb")
+    elif path.endswith(".zst"):
+        if zstandard is None:
+            raise OSError(f"reading {path} requires the 'zstandard' package")
+        stream = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    elif binary:
+        return open(path, "rb")
+    else:
+        return open(path, "r", encoding="utf-8", errors=errors)
+    if binary:
+        return stream
+    return io.TextIOWrapper(stream, encoding="utf-8", errors=errors)
+
+
+class SessionMessage:
+    """One message of a transcript, as yielded by iter_session_messages().
+
+    ``type``, ``role``, ``timestamp`` and ``content`` (the message body: a
+    string or a list of content blocks; the top-level ``content`` when there
+    is no ``message``) are taken from the decoded line once; ``texts``/``text``/``tool_calls`` are derived from ``content`` on
+    access. ``entry`` is the decoded object and ``raw`` the stripped line.
+    """
+
+    __slots__ = ("line_no", "type", "role", "timestamp", "content", "entry", "raw")
+
+    def __init__(self, line_no: int, entry: dict, raw: str):
+        self.line_no = line_no
+        self.type = entry.get("type", "unknown")
+        message = entry.get("message")
+        if isinstance(message, dict):
+            self.role = message.get("role") or self.type
+            self.content = message.get("content", "")
+        else:
+            self.role = self.type
+            # Entries without a message body (system notices) keep text in "content"
+            self.content = message if message is not None else entry.get("content", "")
+        self.timestamp = entry.get("timestamp", "")
+        self.entry = entry
+        self.raw = raw
+
+    @property
+    def texts(self) -> list[str]:
+        """Non-empty text pieces: a string body, or its string/``text`` blocks."""
+        content = self.content
+        if isinstance(content, str):
+            return [content] if content else []
+        pieces = []
+        if isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    part = part.get("text", "")
+                if isinstance(part, str) and part:
+                    pieces.append(part)
+        return pieces
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.texts)
+
+    @property
+    def tool_calls(self) -> list[dict]:
+        """``{"id", "name", "input"}`` for each tool_use block."""
+        if not isinstance(self.content, list):
+            return []
+        return [
+            {"id": block.get("id", ""), "name": block.get("name", ""), "input": block.get("input", {})}
+            for block in self.content
+            if isinstance(block, dict) and block.get("type") == "tool_use"
+        ]
+
+
+def iter_session_messages(lines, counters: dict | None = None):
+    """Decode transcript lines into SessionMessage records.
+
+    *lines* is any iterable of text lines (an open_session() text stream, a
+    generator). Each line is decoded exactly once; blank lines are skipped
+    and lines that are not a JSON object are counted in
+    ``counters["parse_errors"]``. ``counters["total_lines"]`` is the number
+    of lines read so far, so both reflect only what the consumer pulled.
+    """
+    if counters is None:
+        counters = {}
+    counters.setdefault("total_lines", 0)
+    counters.setdefault("parse_errors", 0)
+    for line_no, line in enumerate(lines, 1):
+        counters["total_lines"] += 1
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            counters["parse_errors"] += 1
+            continue
+        if not isinstance(entry, dict):
+            counters["parse_errors"] += 1
+            continue
+        yield SessionMessage(line_no, entry, line)
+
+
+# ---------------------------------------------------------------------------
+# Line counting
+# ---------------------------------------------------------------------------
+
+# Bytes that bytes.strip() removes
+_LINE_WHITESPACE = frozenset(b" \t\n\r\x0b\x0c")
+
+
+def count_nonblank_lines(path) -> int:
+    """Count non-whitespace-only lines in a file without decoding it.
+
+    One pass over the binary lines (compressed transcripts are streamed
+    through open_session()); a line whose first byte is not whitespace is
+    counted without being copied by ``strip()``. Equivalent to
+    ``sum(1 for l in f if l.strip())``. See tests/bench_count_lines.py.
+    """
+    count = 0
+    with open_session(path) as f:
+        for line in f:
+            if line[0] not in _LINE_WHITESPACE or line.strip():
+                count += 1
+    return count
+
+
+# ---------------------------------------------------------------------------
+# Session scan index
+# ---------------------------------------------------------------------------
+
+# Bumped when a cached field changes meaning (3: last_ts is the top-level
+# timestamp; 4: user_count only counts lines that decode as one object)
+SCAN_INDEX_VERSION = 4
+
+
+def default_scan_index_path() -> Path | None:
+    """The current project's scan index, if a .retro/ directory exists here."""
+    rd = retro_dir(".")
+    return rd / "scan_index.json" if rd.is_dir() else None
+
+
+def default_raw_cache_dir() -> Path | None:
+    """The current project's raw-export cache, if a .retro/ directory exists here."""
+    rd = retro_dir(".")
+    return rd / "cache" / "raw" if rd.is_dir() else None
+
+
+def file_signature(st: os.stat_result) -> dict:
+    """Return the (size, mtime_ns, inode) triple used to detect file changes."""
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+
+
+def signature_matches(entry: dict | None, st: os.stat_result) -> bool:
+    """True if an index *entry* was recorded for a file with stat *st*."""
+    if not entry:
+        return False
+    return all(entry.get(k) == v for k, v in file_signature(st).items())
+
+
+def head_digest(f, length: int) -> str:
+    """SHA-1 of the first *length* bytes of binary file object *f*.
+
+    Used to detect files that were rewritten in place rather than appended to.
+    """
+    f.seek(0)
+    return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def load_scan_index(path) -> dict:
+    """Load a scan index, returning an empty one if missing, stale or invalid.
+
+    Layout: ``{"version": N, "files": {abs_path: {size, mtime_ns, inode, ...}},
+    "stats": {abs_path: {size, mtime_ns, inode, ...}}}``. ``files`` holds
+    scan_sessions classifications, ``stats`` holds read_session stats.
+    """
+    empty = {"version": SCAN_INDEX_VERSION, "files": {}, "stats": {}}
+    try:
+        data = read_json(str(path))
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Warning: ignoring unreadable scan index {path}: {e}", file=sys.stderr)
+        return empty
+    if not isinstance(data, dict) or data.get("version") != SCAN_INDEX_VERSION:
+        return empty
+    if not isinstance(data.get("files"), dict):
+        return empty
+    if not isinstance(data.get("stats"), dict):
+        data["stats"] = {}
+    return data
+
+
+def save_scan_index(path, index: dict) -> None:
+    """Persist a scan index atomically."""
+    write_json_atomic(str(path), index)
 
 
 # ---------------------------------------------------------------------------
@@ -190,6 +441,16 @@ def append_evolution(memory_dir, entry):
         f.write(json.dumps(entry, ensure_ascii=False) + "\n")
 
 
+def append_evolution_entries(memory_dir, entries):
+    """Append several event entries to memory/evolution.jsonl in one write."""
+    if not entries:
+        return
+    filepath = os.path.join(memory_dir, "evolution.jsonl")
+    os.makedirs(memory_dir, exist_ok=True)
+    with open(filepath, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+
+
 # ---------------------------------------------------------------------------
 # CLI: state subcommands
 # ---------------------------------------------------------------------------
@@ -11,6 +11,7 @@ from lib import (
     VALID_ASSET_TYPES,
     VALID_STATUSES,
     append_evolution,
+    append_evolution_entries,
     read_json_list,
     type_to_filename,
     utc_now_iso,
@@ -107,61 +108,83 @@ def cmd_create(args):
     print(json.dumps(asset, ensure_ascii=False, indent=2))
 
 
-def cmd_update(args):
-    found_file = None
-    found_index = None
-    found_asset = None
-    found_assets_list = None
+def apply_update(asset, fields):
+    """Apply ``confidence``/``status`` from *fields* to *asset* in place; return the changes.
 
-    for asset_type in VALID_TYPES:
-        filepath = os.path.join(args.memory_dir, type_to_filename(asset_type))
-        assets = read_json_list(filepath)
-        for i, a in enumerate(assets):
-            if a.get("id") == args.id:
-                found_file = filepath
-                found_index = i
-                found_asset = a
-                found_assets_list = assets
-                break
-        if found_asset:
-            break
+    The status is then re-derived from the confidence and the version bumped.
+    """
+    changes = {}
 
-    if found_asset is None:
-        print(f"Error: asset '{args.id}' not found in any file", file=sys.stderr)
-        sys.exit(1)
+    if "confidence" in fields:
+        changes["confidence"] = {"from": asset.get("confidence"), "to": fields["confidence"]}
+        asset["confidence"] = fields["confidence"]
 
-    changes = {}
+    if "status" in fields:
+        changes["status"] = {"from": asset.get("status"), "to": fields["status"]}
+        asset["status"] = fields["status"]
 
-    if args.confidence is not None:
-        changes["confidence"] = {"from": found_asset.get("confidence"), "to": args.confidence}
-        found_asset["confidence"] = args.confidence
+    new_status = confidence_to_status(asset.get("confidence", 0.70))
+    if asset.get("status") != new_status:
+        changes["status_auto"] = {"from": asset.get("status"), "to": new_status}
+        asset["status"] = new_status
 
-    if args.status is not None:
-        if args.status not in VALID_STATUSES:
-            print(f"Error: invalid status '{args.status}', must be one of {VALID_STATUSES}", file=sys.stderr)
-            sys.exit(1)
-        changes["status"] = {"from": found_asset.get("status"), "to": args.status}
-        found_asset["status"] = args.status
+    asset["version"] = asset.get("version", 1) + 1
+    changes["version"] = asset["version"]
+    return changes
 
-    new_status = confidence_to_status(found_asset.get("confidence", 0.70))
-    if found_asset.get("status") != new_status:
-        changes["status_auto"] = {"from": found_asset.get("status"), "to": new_status}
-        found_asset["status"] = new_status
 
-    found_asset["version"] = found_asset.get("version", 1) + 1
-    changes["version"] = found_asset["version"]
+def update_assets(memory_dir, updates, extra_events=()):
+    """Apply many asset updates in one pass over memory/.
 
-    found_assets_list[found_index] = found_asset
-    write_json_atomic(found_file, found_assets_list)
+    *updates* maps asset id -> fields for apply_update(). Each asset file is
+    read, modified and written atomically at most once, and every ``update``
+    evolution event (followed by *extra_events*) goes out in a single append.
+    Returns ``(updated, missing)``: updated assets by id, and the ids that
+    were not found in any file.
+    """
+    remaining = dict(updates)
+    updated = {}
+    events = []
+    ts = utc_now_iso()
 
-    append_evolution(args.memory_dir, {
-        "ts": utc_now_iso(),
-        "event": "update",
-        "asset_id": args.id,
-        "changes": changes,
-    })
+    for asset_type in VALID_TYPES:
+        if not remaining:
+            break
+        filepath = os.path.join(memory_dir, type_to_filename(asset_type))
+        assets = read_json_list(filepath)
+        dirty = False
+        for asset in assets:
+            fields = remaining.pop(asset.get("id"), None)
+            if fields is None:
+                continue
+            changes = apply_update(asset, fields)
+            updated[asset["id"]] = asset
+            events.append({"ts": ts, "event": "update", "asset_id": asset["id"], "changes": changes})
+            dirty = True
+        if dirty:
+            write_json_atomic(filepath, assets)
+
+    append_evolution_entries(memory_dir, events + list(extra_events))
+    return updated, sorted(remaining)
+
+
+def cmd_update(args):
+    if args.status is not None and args.status not in VALID_STATUSES:
+        print(f"Error: invalid status '{args.status}', must be one of {VALID_STATUSES}", file=sys.stderr)
+        sys.exit(1)
+
+    fields = {}
+    if args.confidence is not None:
+        fields["confidence"] = args.confidence
+    if args.status is not None:
+        fields["status"] = args.status
+
+    updated, missing = update_assets(args.memory_dir, {args.id: fields})
+    if missing:
+        print(f"Error: asset '{args.id}' not found in any file", file=sys.stderr)
+        sys.exit(1)
 
-    print(json.dumps(found_asset, ensure_ascii=False, indent=2))
+    print(json.dumps(updated[args.id], ensure_ascii=False, indent=2))
 
 
 def cmd_list(args):
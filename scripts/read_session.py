@@ -6,14 +6,205 @@ Outputs clean JSON to stdout for downstream consumption.
 """
 
 import argparse
+import hashlib
+import io
 import json
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pathlib import Path
 
+from lib import (
+    SessionMessage,
+    default_raw_cache_dir,
+    default_scan_index_path,
+    file_signature,
+    head_digest,
+    is_compressed_session,
+    iter_session_messages,
+    load_scan_index,
+    open_session,
+    read_json,
+    save_scan_index,
+    session_id_from_path,
+    signature_matches,
+    write_json_atomic,
+)
+
+
+# Preview content is cut to this many characters
+PREVIEW_CHARS = 500
+
+# Bytes hashed to tell an appended-to transcript from a rewritten one
+OFFSET_HEAD_BYTES = 4096
+
+
+def _preview_content(texts: list[str], limit: int = PREVIEW_CHARS) -> str:
+    """Render a message's text pieces for preview, keeping at most *limit* chars.
+
+    Pieces are joined with newlines only until the limit is reached; the
+    rest are just measured for the "[N chars total]" suffix.
+    """
+    parts = []
+    head_len = 0
+    total = 0
+    for text in texts:
+        piece = "\n" + text if total else text
+        total += len(piece)
+        if head_len <= limit:
+            piece = piece[:limit + 1 - head_len]
+            parts.append(piece)
+            head_len += len(piece)
+    head = "".join(parts)
+
+    if total > limit:
+        return head[:limit] + f"... [{total} chars total]"
+    return head
+
+
+def _preview(msg: SessionMessage) -> dict:
+    """Build the preview record for one message from its SessionMessage.texts."""
+    return {
+        "type": msg.type,
+        "content": _preview_content(msg.texts),
+    }
+
+
+def offset_index_path(file_path, index_dir) -> Path:
+    """Sidecar location for a transcript's offset index inside *index_dir*."""
+    digest = hashlib.sha1(str(Path(file_path).resolve()).encode("utf-8")).hexdigest()[:16]
+    return Path(index_dir) / f"{digest}.json"
+
+
+def load_offset_index(file_path, index_dir=None) -> dict:
+    """Return the message-number -> byte-offset index for a transcript.
+
+    ``offsets[n]``/``types[n]`` give the byte offset and type of message *n*
+    (the n-th valid JSON object line, as numbered by preview). Built on first
+    use and cached in *index_dir*; an unchanged file reuses the cache, a file
+    that only grew is extended from the last indexed byte (``end``). Only
+    newline-terminated lines are indexed. Compressed archives get no head
+    hash, so any change to them rebuilds the index.
+    """
+    path = Path(file_path)
+    st = path.stat()
+    cache_path = offset_index_path(path, index_dir) if index_dir else None
+    cached = None
+    if cache_path is not None:
+        try:
+            cached = read_json(str(cache_path))
+        except (json.JSONDecodeError, OSError):
+            cached = None
+        if signature_matches(cached, st):
+            return cached
+
+    idx = {"file": str(path.resolve()), "end": 0, "offsets": [], "types": []}
+    compressed = is_compressed_session(path)
+    with open_session(path) as f:
+        if (
+            isinstance(cached, dict)
+            and cached.get("inode") == st.st_ino
+            and 0 < cached.get("end", 0) <= st.st_size
+            and cached.get("head_len")
+            and head_digest(f, cached["head_len"]) == cached.get("head_hash")
+        ):
+            idx.update(end=cached["end"], offsets=cached["offsets"], types=cached["types"])
+        pos = idx["end"]
+        if not compressed:
+            f.seek(pos)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # last line still being written
+            line = raw.strip()
+            if line:
+                try:
+                    obj = json.loads(line.decode("utf-8", "replace"))
+                except json.JSONDecodeError:
+                    obj = None
+                if isinstance(obj, dict):
+                    idx["offsets"].append(pos)
+                    idx["types"].append(str(obj.get("type", "unknown")))
+            pos += len(raw)
+        idx["end"] = pos
+        idx["head_len"] = 0 if compressed else min(OFFSET_HEAD_BYTES, pos)
+        idx["head_hash"] = head_digest(f, idx["head_len"]) if idx["head_len"] else ""
+    idx.update(file_signature(st))
+
+    if cache_path is not None:
+        try:
+            write_json_atomic(str(cache_path), idx)
+        except OSError as e:
+            print(f"Warning: could not write offset index {cache_path}: {e}", file=sys.stderr)
+    return idx
+
+
+def _seek_forward(f, offset: int) -> None:
+    """Position a fresh binary stream at *offset*; non-seekable (zstd) streams are read forward."""
+    if f.seekable():
+        f.seek(offset)
+        return
+    while offset > 0:
+        data = f.read(min(offset, 1 << 20))
+        if not data:
+            break
+        offset -= len(data)
+
+
+def read_session_range(
+    file_path: str,
+    start: int = 0,
+    stop: int | None = None,
+    max_messages: int = 0,
+    types: list[str] | None = None,
+    index_dir=None,
+) -> dict:
+    """Preview messages ``start <= n < stop`` by seeking straight to them.
+
+    Uses load_offset_index(), so earlier messages are never decoded. Each
+    preview carries its message number as ``index``.
+    """
+    path = Path(file_path)
+    if not path.exists():
+        return {"error": f"File not found: {file_path}"}
+
+    counters = {"total_lines": 0, "parse_errors": 0}
+    try:
+        idx = load_offset_index(path, index_dir)
+        n = len(idx["offsets"])
+        start = max(0, min(start, n))
+        stop = n if stop is None else max(start, min(stop, n))
+        with open_session(path) as raw:
+            _seek_forward(raw, idx["offsets"][start] if start < n else idx["end"])
+            f = io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+            numbered = zip(range(start, stop), iter_session_messages(f, counters))
+            matching = ((i, msg) for i, msg in numbered if not types or msg.type in types)
+            previews = [{"index": i, **_preview(msg)} for i, msg in islice(matching, max_messages or None)]
+    except OSError as e:
+        return {"error": f"Could not read file: {e}"}
+
+    return {
+        "file": str(path),
+        "size_bytes": path.stat().st_size,
+        "indexed_messages": n,
+        "range": {"from": start, "to": stop},
+        "total_lines": counters["total_lines"],
+        "parse_errors": counters["parse_errors"],
+        "total_messages": len(previews),
+        "messages": previews,
+    }
+
 
 def read_session(file_path: str, max_messages: int = 0, types: list[str] | None = None) -> dict:
     """Read a session JSONL file, return structured summary.
 
+    Streams the file: lines are parsed, filtered and turned into truncated
+    previews one at a time, and reading stops once *max_messages* matches
+    have been found, so memory is bounded by the preview size. With a limit,
+    ``total_lines``/``parse_errors`` cover only the lines read before stopping;
+    one more match is looked for to set ``has_more`` (and the ``"N of N+1+"``
+    form of ``total_messages``).
+
     Args:
         file_path: Path to .jsonl session file.
         max_messages: Max messages to include (0 = all).
@@ -24,78 +215,115 @@ def read_session(file_path: str, max_messages: int = 0, types: list[str] | None
         return {"error": f"File not found: {file_path}"}
 
     size_bytes = path.stat().st_size
-    messages = []
-    parse_errors = 0
-    total_lines = 0
+    counters = {"total_lines": 0, "parse_errors": 0}
 
     try:
-        with open(path, "r", encoding="utf-8", errors="replace") as f:
+        with open_session(path, "r", errors="replace") as f:
+            matching = (
+                msg for msg in iter_session_messages(f, counters)
+                if not types or msg.type in types
+            )
+            previews = [_preview(msg) for msg in islice(matching, max_messages or None)]
+            has_more = max_messages > 0 and next(matching, None) is not None
+    except OSError as e:
+        return {"error": f"Could not read file: {e}"}
+
+    return {
+        "file": str(path),
+        "size_bytes": size_bytes,
+        "total_lines": counters["total_lines"],
+        "parse_errors": counters["parse_errors"],
+        "total_messages": f"{len(previews)} of {len(previews) + 1}+" if has_more else len(previews),
+        "has_more": has_more,
+        "messages": previews,
+    }
+
+
+def session_stats(file_path: str, index_path=None) -> dict:
+    """Count lines, parse errors, messages and bytes per type.
+
+    Counting-only path for ``stats``: every non-blank line is still fully
+    decoded with json.loads (telling a parse error from a message needs the
+    whole line), but only its type is kept; no SessionMessage records or
+    previews are built and the decoded object is dropped at once. If
+    *index_path* is given, results are cached in the scan index's ``stats``
+    section and reused while the file's (size, mtime_ns, inode) is unchanged.
+    """
+    path = Path(file_path)
+    if not path.exists():
+        return {"error": f"File not found: {file_path}"}
+
+    st = path.stat()
+    key = str(path.resolve())
+    index = load_scan_index(index_path) if index_path else None
+    if index is not None:
+        cached = index["stats"].get(key)
+        if signature_matches(cached, st):
+            return {"file": str(path), **cached["result"]}
+
+    total_lines = 0
+    parse_errors = 0
+    type_counts = {}
+    type_bytes = {}
+    try:
+        with open_session(path) as f:
             for line in f:
                 total_lines += 1
                 line = line.strip()
                 if not line:
                     continue
                 try:
-                    obj = json.loads(line)
+                    obj = json.loads(line.decode("utf-8", "replace"))
                 except json.JSONDecodeError:
                     parse_errors += 1
                     continue
-
-                if types and obj.get("type") not in types:
+                if not isinstance(obj, dict):
+                    parse_errors += 1
                     continue
-
-                messages.append(obj)
+                t = obj.get("type", "unknown")
+                if not isinstance(t, str):
+                    t = str(t)
+                type_counts[t] = type_counts.get(t, 0) + 1
+                type_bytes[t] = type_bytes.get(t, 0) + len(line)
     except OSError as e:
         return {"error": f"Could not read file: {e}"}
 
-    # Apply max_messages limit
-    if max_messages > 0:
-        messages = messages[:max_messages]
+    msg_count = sum(type_counts.values())
+    result = {
+        "size_bytes": st.st_size,
+        "total_lines": total_lines,
+        "parse_errors": parse_errors,
+        "total_messages": msg_count,
+        "message_count": msg_count,
+        "type_distribution": type_counts,
+        "bytes_by_type": type_bytes,
+    }
 
-    # Truncate large message content for preview
-    previews = []
-    for msg in messages:
-        preview = {
-            "type": msg.get("type", "unknown"),
-        }
+    if index is not None:
+        index["stats"][key] = {**file_signature(st), "result": result}
+        try:
+            save_scan_index(index_path, index)
+        except OSError as e:
+            print(f"Warning: could not write scan index {index_path}: {e}", file=sys.stderr)
 
-        # Extract message content - handle various formats
-        content = msg.get("message", msg.get("content", ""))
-        if isinstance(content, list):
-            # Handle content blocks (e.g. [{"type": "text", "text": "..."}])
-            texts = []
-            for block in content:
-                if isinstance(block, dict) and "text" in block:
-                    texts.append(block["text"])
-                elif isinstance(block, str):
-                    texts.append(block)
-            content = "\n".join(texts)
-        elif not isinstance(content, str):
-            content = str(content)
-
-        # Truncate for preview
-        if len(content) > 500:
-            preview["content"] = content[:500] + f"... [{len(content)} chars total]"
-        else:
-            preview["content"] = content
+    return {"file": str(path), **result}
 
-        previews.append(preview)
 
-    return {
-        "file": str(path),
-        "size_bytes": size_bytes,
-        "total_lines": total_lines,
-        "parse_errors": parse_errors,
-        "total_messages": len(messages) if max_messages == 0 else f"{len(previews)} of {len(messages)}+",
-        "messages": previews,
-    }
+def _decoded_lines(f, counters: dict):
+    """Decode the lines of binary file *f*, summing their size in ``counters["source_bytes"]``."""
+    for raw in f:
+        counters["source_bytes"] += len(raw)
+        yield raw.decode("utf-8", "replace")
 
 
-def read_raw(file_path: str, max_chars: int = 50000) -> dict:
+def read_raw(file_path: str, max_chars: int = 50000, compact: bool = False, counters: dict | None = None) -> dict:
     """Read raw session content for facet extraction.
 
     Returns the full content (up to max_chars) with only valid JSON lines,
-    suitable for passing to sub-agents.
+    suitable for passing to sub-agents. With *compact*, tool payloads are
+    replaced by stubs first (see compact_message()) and a ``compaction``
+    report is added. If *counters* is given, ``counters["source_bytes"]``
+    is set to the number of (decompressed) bytes the result depends on.
     """
     path = Path(file_path)
     if not path.exists():
@@ -105,20 +333,13 @@ def read_raw(file_path: str, max_chars: int = 50000) -> dict:
     valid_lines = []
     char_count = 0
     truncated = False
-    parse_errors = 0
+    if counters is None:
+        counters = {}
+    counters.update(parse_errors=0, source_bytes=0)
 
     try:
-        with open(path, "r", encoding="utf-8", errors="replace") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    json.loads(line)  # validate
-                except json.JSONDecodeError:
-                    parse_errors += 1
-                    continue
-
+        with open_session(path) as f:
+            for _, line in _iter_valid_lines(_decoded_lines(f, counters), counters, compact=compact):
                 if max_chars > 0 and char_count + len(line) > max_chars:
                     truncated = True
                     break
@@ -128,17 +349,625 @@ def read_raw(file_path: str, max_chars: int = 50000) -> dict:
     except OSError as e:
         return {"error": f"Could not read file: {e}"}
 
-    return {
+    result = {
         "file": str(path),
         "size_bytes": size_bytes,
         "char_count": char_count,
         "valid_lines": len(valid_lines),
-        "parse_errors": parse_errors,
+        "parse_errors": counters["parse_errors"],
+        "truncated": truncated,
+    }
+    if compact:
+        result["compaction"] = compaction_report(counters)
+    result["content"] = "\n".join(valid_lines)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# raw cache
+# ---------------------------------------------------------------------------
+
+# Default size cap of .retro/cache/raw/; least recently used entries go first
+RAW_CACHE_MAX_BYTES = 256 << 20
+
+# Bump when read_raw()'s output changes so stale entries stop matching
+RAW_CACHE_VERSION = 1
+
+
+def _range_digest(file_path, end: int, max_chars: int, compact: bool) -> str:
+    """SHA-256 over the read_raw() parameters and the first *end* stored bytes of a file."""
+    h = hashlib.sha256(
+        json.dumps({"v": RAW_CACHE_VERSION, "max_chars": max_chars, "compact": compact}).encode("utf-8")
+    )
+    with open(file_path, "rb") as f:
+        while end > 0:
+            block = f.read(min(end, 1 << 20))
+            if not block:
+                break
+            h.update(block)
+            end -= len(block)
+    return h.hexdigest()
+
+
+def _range_pointer(cache_dir, path: Path, max_chars: int, compact: bool) -> Path:
+    """Where the source range of *path*'s last cached read_raw() is recorded."""
+    ident = json.dumps([str(path.resolve()), max_chars, compact])
+    return Path(cache_dir) / "ranges" / f"{hashlib.sha1(ident.encode('utf-8')).hexdigest()[:16]}.json"
+
+
+def evict_raw_cache(cache_dir, max_bytes: int = RAW_CACHE_MAX_BYTES) -> int:
+    """Delete least recently used entries until *cache_dir* fits in *max_bytes*.
+
+    Entries are touched on every hit, so mtime order is LRU order. Range
+    pointers whose entry is gone are pruned along with them. Returns the
+    number of entries removed.
+    """
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".json") and entry.is_file():
+                    st = entry.stat()
+                    entries.append((st.st_mtime_ns, st.st_size, entry.path))
+    except FileNotFoundError:
+        return 0
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, entry_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(entry_path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    if removed:
+        _prune_range_pointers(cache_dir)
+    return removed
+
+
+def _prune_range_pointers(cache_dir) -> None:
+    """Delete the ``ranges/`` pointers whose cache entry no longer exists."""
+    ranges = Path(cache_dir) / "ranges"
+    try:
+        pointers = list(ranges.glob("*.json"))
+    except OSError:
+        return
+    for pointer in pointers:
+        try:
+            digest = read_json(str(pointer)).get("entry")
+        except (json.JSONDecodeError, OSError, AttributeError):
+            digest = None
+        if digest and (Path(cache_dir) / f"{digest}.json").is_file():
+            continue
+        try:
+            pointer.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def cached_read_raw(
+    file_path: str,
+    max_chars: int = 50000,
+    compact: bool = False,
+    cache_dir=None,
+    max_bytes: int = RAW_CACHE_MAX_BYTES,
+) -> dict:
+    """read_raw() backed by a content-addressed cache in *cache_dir*.
+
+    Entries live at ``<cache_dir>/<sha256>.json``, keyed by the parameters
+    plus the bytes of the *source range*: the prefix of the file the result
+    was built from (up to the line that hit *max_chars*, or the whole file;
+    always the whole stored file for compressed archives). A small pointer
+    under ``ranges/`` remembers that range per path, so a lookup hashes
+    only those bytes -- a transcript that has since grown past a truncated
+    export still hits, while any edit inside the range misses. A hit
+    returns the stored result (with the current ``size_bytes``) without
+    decoding the transcript; a miss runs
+    read_raw(), stores the result and evicts down to *max_bytes*. Without
+    *cache_dir* this is plain read_raw(). Cache I/O problems only warn.
+    """
+    path = Path(file_path)
+    if cache_dir is None or not path.is_file():
+        return read_raw(file_path, max_chars=max_chars, compact=compact)
+
+    pointer = _range_pointer(cache_dir, path, max_chars, compact)
+    try:
+        size = path.stat().st_size
+        rng = read_json(str(pointer))
+        end = rng["end"]
+        if size == end or (size > end and not rng["to_eof"]):
+            entry = Path(cache_dir) / f"{_range_digest(path, end, max_chars, compact)}.json"
+            cached = read_json(str(entry))
+            os.utime(entry)
+            # A truncated export still hits after the transcript grows
+            return {"file": str(path), **cached, "size_bytes": size}
+    except (json.JSONDecodeError, OSError, KeyError, TypeError):
+        pass
+
+    counters = {}
+    result = read_raw(file_path, max_chars=max_chars, compact=compact, counters=counters)
+    if "error" in result:
+        return result
+    if is_compressed_session(path):
+        end, to_eof = result["size_bytes"], True
+    else:
+        end, to_eof = counters["source_bytes"], not result["truncated"]
+    try:
+        digest = _range_digest(path, end, max_chars, compact)
+        write_json_atomic(str(Path(cache_dir) / f"{digest}.json"), {k: v for k, v in result.items() if k != "file"})
+        write_json_atomic(str(pointer), {"end": end, "to_eof": to_eof, "entry": digest})
+        evict_raw_cache(cache_dir, max_bytes)
+    except OSError as e:
+        print(f"Warning: could not write raw cache in {cache_dir}: {e}", file=sys.stderr)
+    return result
+
+
+# Read size for raw passthrough; lines longer than this grow the buffer
+PASSTHROUGH_BLOCK = 1 << 20
+
+_WHITESPACE = b" \t\r\n\x0b\x0c"
+
+
+def _is_json_object(line: bytes) -> bool:
+    """True if *line* decodes (invalid UTF-8 replaced, as read_raw does) to a JSON object."""
+    try:
+        # Decoding first is faster than json.loads(bytes), which sniffs the encoding
+        obj = json.loads(line.decode("utf-8", "replace"))
+    except json.JSONDecodeError:
+        return False
+    return isinstance(obj, dict)
+
+
+def passthrough_raw(file_path: str, out, max_bytes: int = 0, block_size: int = PASSTHROUGH_BLOCK) -> dict:
+    """Copy the valid JSON lines of a session to the binary stream *out*.
+
+    Binary counterpart of read_raw() for large exports: the file is read
+    with ``readinto`` into one reusable buffer and valid lines are written
+    straight from it through a ``memoryview`` (runs of consecutive valid
+    lines go out as a single write). Each line is parsed once, from a copy of
+    its bytes, with the same rule as read_raw() (a JSON object; invalid UTF-8
+    is replaced); lines not framed by ``{``/``}`` are rejected without
+    parsing. Output bytes are never re-encoded. Output is JSONL (one
+    line per message, newline-terminated), stopped at a line boundary once
+    *max_bytes* (0 = unlimited) would be exceeded. Returns the same
+    bookkeeping fields as read_raw(), without ``content``.
+    """
+    path = Path(file_path)
+    if not path.exists():
+        return {"error": f"File not found: {file_path}"}
+
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    written = valid = errors = 0
+    truncated = False
+    carry = 0  # bytes of an unfinished line kept at the front of buf
+
+    def accept(lo, hi):
+        """Validate buf[lo:hi]; returns True if it fits the budget and should be written."""
+        nonlocal valid, errors, written, truncated
+        while lo < hi and buf[lo] in _WHITESPACE:
+            lo += 1
+        while hi > lo and buf[hi - 1] in _WHITESPACE:
+            hi -= 1
+        if lo == hi:
+            return None
+        if buf[lo] != 0x7B or buf[hi - 1] != 0x7D or not _is_json_object(buf[lo:hi]):
+            errors += 1
+            return None
+        if max_bytes > 0 and written + (hi - lo) > max_bytes:
+            truncated = True
+            return None
+        valid += 1
+        written += hi - lo
+        return lo, hi
+
+    try:
+        with open_session(path) as f:
+            while not truncated:
+                if carry == len(buf):
+                    view.release()
+                    buf.extend(bytes(len(buf)))
+                    view = memoryview(buf)
+                n = f.readinto(view[carry:])
+                end = carry + n
+                if not n:
+                    line = accept(0, end) if end else None
+                    if line:
+                        out.write(view[line[0] : line[1]])
+                        out.write(b"\n")
+                    break
+                run_lo = run_hi = 0  # pending run of consecutive valid lines, newline included
+                start = 0
+                while not truncated:
+                    nl = buf.find(b"\n", start, end)
+                    if nl < 0:
+                        break
+                    line = accept(start, nl)
+                    if line:
+                        lo, hi = line
+                        if lo == run_hi and hi == nl:
+                            run_hi = nl + 1
+                        else:
+                            if run_hi > run_lo:
+                                out.write(view[run_lo:run_hi])
+                            if hi == nl:
+                                run_lo, run_hi = lo, nl + 1
+                            else:
+                                out.write(view[lo:hi])
+                                out.write(b"\n")
+                                run_lo = run_hi = nl + 1
+                    start = nl + 1
+                if run_hi > run_lo:
+                    out.write(view[run_lo:run_hi])
+                carry = end - start
+                buf[:carry] = view[start:end]
+    except BrokenPipeError:
+        raise
+    except OSError as e:
+        return {"error": f"Could not read file: {e}"}
+    finally:
+        view.release()
+
+    return {
+        "file": str(path),
+        "size_bytes": path.stat().st_size,
+        "byte_count": written,
+        "valid_lines": valid,
+        "parse_errors": errors,
         "truncated": truncated,
-        "content": "\n".join(valid_lines),
     }
 
 
+# Message types kept by compaction; everything else (progress, system,
+# summaries, file snapshots) is dropped
+COMPACT_TYPES = ("user", "assistant", "human")
+
+
+def _payload_size(value) -> int:
+    """Character size of a tool payload as it appears in the transcript."""
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value, ensure_ascii=False))
+
+
+def compact_message(msg: SessionMessage, tool_names: dict) -> dict | None:
+    """Reduce a transcript message to its conversational content.
+
+    Keeps user/assistant text of ``msg.content``; tool_use, tool_result,
+    thinking and image blocks become typed stubs recording tool name,
+    payload size and status. *tool_names* maps tool_use ids to names across
+    calls so results can be labelled. Returns None for entries that carry
+    no conversation.
+    """
+    if msg.type not in COMPACT_TYPES:
+        return None
+    content = msg.content
+
+    if isinstance(content, list):
+        blocks = []
+        for block in content:
+            if isinstance(block, str):
+                blocks.append({"type": "text", "text": block})
+                continue
+            if not isinstance(block, dict):
+                continue
+            kind = block.get("type")
+            if kind == "text":
+                blocks.append({"type": "text", "text": block.get("text", "")})
+            elif kind == "tool_use":
+                tool_names[block.get("id")] = block.get("name", "unknown")
+                blocks.append({
+                    "type": "tool_use",
+                    "name": block.get("name", "unknown"),
+                    "input_chars": _payload_size(block.get("input", {})),
+                })
+            elif kind == "tool_result":
+                blocks.append({
+                    "type": "tool_result",
+                    "name": tool_names.get(block.get("tool_use_id"), "unknown"),
+                    "status": "error" if block.get("is_error") else "ok",
+                    "output_chars": _payload_size(block.get("content", "")),
+                })
+            elif kind == "thinking":
+                blocks.append({"type": "thinking", "chars": len(block.get("thinking", ""))})
+            else:
+                blocks.append({"type": kind or "unknown", "chars": _payload_size(block)})
+        content = blocks
+    elif not isinstance(content, str):
+        content = str(content)
+
+    compact = {"type": msg.type}
+    if "timestamp" in msg.entry:
+        compact["timestamp"] = msg.timestamp
+    compact["content"] = content
+    return compact
+
+
+def _iter_valid_lines(f, counters: dict, compact: bool = False):
+    """Yield ``(line_no, line)`` for each message line of an open file.
+
+    Built on iter_session_messages(): *line_no* is 1-based, blank lines are
+    skipped and lines that are not a JSON object are counted in
+    ``counters["parse_errors"]``. With *compact*, each line is
+    replaced by its compact_message() form (entries without conversation
+    are dropped) and ``counters["input_chars"]``/``["output_chars"]``/
+    ``["dropped"]`` track the reduction.
+    """
+    tool_names = {}
+    for msg in iter_session_messages(f, counters):
+        line = msg.raw
+        if compact:
+            counters["input_chars"] = counters.get("input_chars", 0) + len(line)
+            obj = compact_message(msg, tool_names)
+            if obj is None:
+                counters["dropped"] = counters.get("dropped", 0) + 1
+                continue
+            line = json.dumps(obj, ensure_ascii=False)
+            counters["output_chars"] = counters.get("output_chars", 0) + len(line)
+        yield msg.line_no, line
+
+
+def compaction_report(counters: dict) -> dict:
+    """Summarize the size reduction recorded by _iter_valid_lines(compact=True)."""
+    input_chars = counters.get("input_chars", 0)
+    output_chars = counters.get("output_chars", 0)
+    return {
+        "input_chars": input_chars,
+        "output_chars": output_chars,
+        "dropped_lines": counters.get("dropped", 0),
+        "ratio": round(output_chars / input_chars, 4) if input_chars else 1.0,
+    }
+
+
+def iter_chunks(
+    f,
+    chunk_chars: int = 50000,
+    overlap: int = 0,
+    counters: dict | None = None,
+    compact: bool = False,
+):
+    """Split an open session file into budget-sized chunks on message boundaries.
+
+    Each chunk holds whole valid JSON lines totalling at most *chunk_chars*
+    characters (a single larger message becomes a chunk of its own, flagged
+    ``oversized``). Up to *overlap* trailing messages of a chunk are repeated
+    at the start of the next one, as long as they take at most half the
+    budget and leave room for the message that opens the next chunk;
+    ``overlap_messages``/``overlap_chars`` record how much of a
+    chunk's head is repeated context. With *compact*, chunks are built from
+    compacted messages (see compact_message()).
+    """
+    counters = counters if counters is not None else {"parse_errors": 0}
+    chunk = []  # (line_no, line) pairs
+    chunk_len = 0
+    n_overlap = 0
+    index = 0
+
+    def emit():
+        return {
+            "chunk_index": index,
+            "start_line": chunk[0][0],
+            "end_line": chunk[-1][0],
+            "message_count": len(chunk),
+            "char_count": chunk_len,
+            "overlap_messages": n_overlap,
+            "overlap_chars": sum(len(line) for _, line in chunk[:n_overlap]),
+            "oversized": chunk_len > chunk_chars,
+            "content": "\n".join(line for _, line in chunk),
+        }
+
+    for line_no, line in _iter_valid_lines(f, counters, compact=compact):
+        if chunk_len + len(line) > chunk_chars and len(chunk) > n_overlap:
+            yield emit()
+            index += 1
+            # Carry trailing context into the next chunk
+            carried = []
+            carried_len = 0
+            for item in reversed(chunk[-overlap:] if overlap > 0 else []):
+                if carried_len + len(item[1]) > chunk_chars // 2:
+                    break
+                carried.insert(0, item)
+                carried_len += len(item[1])
+            # Drop the oldest context until the incoming message fits
+            while carried and carried_len + len(line) > chunk_chars:
+                carried_len -= len(carried.pop(0)[1])
+            chunk, chunk_len, n_overlap = carried, carried_len, len(carried)
+        chunk.append((line_no, line))
+        chunk_len += len(line)
+
+    if len(chunk) > n_overlap:
+        yield emit()
+
+
+def session_chunks(
+    file_path: str,
+    chunk_chars: int,
+    overlap: int,
+    out_dir: str | None = None,
+    compact: bool = False,
+):
+    """Yield one record per chunk, then ``{"summary": ...}`` (or one ``{"error": ...}``).
+
+    With *out_dir*, chunk content goes to separate files and each record
+    carries the file path instead of the content.
+    """
+    path = Path(file_path)
+    if not path.exists():
+        yield {"error": f"File not found: {file_path}"}
+        return
+    if chunk_chars <= 0:
+        yield {"error": "--chunk-chars must be positive"}
+        return
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    counters = {"parse_errors": 0}
+    n_chunks = 0
+    try:
+        with open_session(path, "r", errors="replace") as f:
+            for chunk in iter_chunks(f, chunk_chars, overlap, counters, compact=compact):
+                if out_dir:
+                    chunk_path = os.path.join(out_dir, f"{session_id_from_path(path)}.chunk-{chunk['chunk_index']:04d}.jsonl")
+                    with open(chunk_path, "w", encoding="utf-8") as out:
+                        out.write(chunk.pop("content") + "\n")
+                    chunk["path"] = chunk_path
+                yield chunk
+                n_chunks += 1
+    except BrokenPipeError:
+        raise
+    except OSError as e:
+        yield {"error": f"Could not read file: {e}"}
+        return
+
+    summary = {
+        "file": str(path),
+        "size_bytes": path.stat().st_size,
+        "chunk_count": n_chunks,
+        "chunk_chars": chunk_chars,
+        "overlap": overlap,
+        "parse_errors": counters["parse_errors"],
+    }
+    if compact:
+        summary["compaction"] = compaction_report(counters)
+    yield {"summary": summary}
+
+
+def write_chunks(
+    file_path: str,
+    chunk_chars: int,
+    overlap: int,
+    out_dir: str | None = None,
+    compact: bool = False,
+) -> None:
+    """CLI driver for ``chunks``: one NDJSON record per chunk, then a summary."""
+    for record in session_chunks(file_path, chunk_chars, overlap, out_dir, compact):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# ---------------------------------------------------------------------------
+# batch
+# ---------------------------------------------------------------------------
+
+BATCH_MODES = ("stats", "preview", "raw", "chunks")
+
+
+def batch_inputs(text: str) -> list[str]:
+    """Session paths from *text*: scan_sessions JSON/NDJSON output or one path per line.
+
+    Accepts a JSON array of records, the ``--all-projects`` dict of arrays,
+    or NDJSON records (``summary``/``error`` lines are skipped). Records
+    contribute their ``file_path``; bare lines are taken as paths.
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = None
+    if isinstance(data, dict):
+        data = [rec for recs in data.values() if isinstance(recs, list) for rec in recs]
+    if isinstance(data, list):
+        return [rec["file_path"] if isinstance(rec, dict) else str(rec) for rec in data
+                if not isinstance(rec, dict) or "file_path" in rec]
+
+    files = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError:
+            files.append(line)
+            continue
+        if isinstance(rec, dict) and "file_path" in rec:
+            files.append(rec["file_path"])
+        elif isinstance(rec, str):
+            files.append(rec)
+    return files
+
+
+def _batch_job(job) -> list[dict]:
+    """Run one batch mode on one file; module-level so worker processes can pickle it."""
+    mode, file_path, opts = job
+    if mode == "stats":
+        records = [session_stats(file_path)]
+    elif mode == "preview":
+        records = [read_session(file_path, max_messages=opts["max"], types=opts["types"])]
+    elif mode == "raw":
+        records = [
+            cached_read_raw(
+                file_path,
+                max_chars=opts["max_chars"],
+                compact=opts["compact"],
+                cache_dir=opts.get("cache_dir"),
+                max_bytes=opts.get("cache_max_bytes", RAW_CACHE_MAX_BYTES),
+            )
+        ]
+    else:
+        records = list(
+            session_chunks(file_path, opts["chunk_chars"], opts["overlap"], opts["out_dir"], opts["compact"])
+        )
+    return [{"file": file_path, **rec} if "file" not in rec else rec for rec in records]
+
+
+def run_batch(mode: str, files: list[str], opts: dict, workers: int = 1, index_path=None):
+    """Yield ``(file, records)`` for every file in input order, in one process (plus optional pool).
+
+    For ``stats``, *index_path* is loaded once and saved once at the end;
+    only files whose signature changed are recomputed.
+    """
+    index = load_scan_index(index_path) if mode == "stats" and index_path else None
+    # Keyed by input position: the same path may be listed more than once
+    done = {}
+    jobs = []
+    for pos, fp in enumerate(files):
+        if index is not None:
+            try:
+                st = os.stat(fp)
+            except OSError:
+                st = None
+            cached = index["stats"].get(str(Path(fp).resolve())) if st else None
+            if st and signature_matches(cached, st):
+                done[pos] = [{"file": fp, **cached["result"]}]
+                continue
+        jobs.append((mode, fp, opts))
+
+    if workers > 1 and len(jobs) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_batch_job, jobs)
+    else:
+        pool = None
+        results = map(_batch_job, jobs)
+
+    dirty = False
+    try:
+        pending = iter(zip(jobs, results))
+        for pos, fp in enumerate(files):
+            if pos in done:
+                yield fp, done.pop(pos)
+                continue
+            (_, job_fp, _), records = next(pending)
+            if index is not None and "error" not in records[0]:
+                try:
+                    st = os.stat(job_fp)
+                except OSError:
+                    st = None
+                if st is not None:
+                    result = {k: v for k, v in records[0].items() if k != "file"}
+                    index["stats"][str(Path(job_fp).resolve())] = {**file_signature(st), "result": result}
+                    dirty = True
+            yield job_fp, records
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if dirty:
+            try:
+                save_scan_index(index_path, index)
+            except OSError as e:
+                print(f"Warning: could not write scan index {index_path}: {e}", file=sys.stderr)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Safely read Claude session JSONL files")
     subparsers = parser.add_subparsers(dest="command", required=True)
@@ -153,6 +982,26 @@ def main():
         default=None,
         help="Filter by message types (e.g. human user assistant)",
     )
+    preview_parser.add_argument(
+        "--from",
+        dest="start",
+        type=int,
+        default=None,
+        help="First message number to show (0-based; seeks via the offset index)",
+    )
+    preview_parser.add_argument(
+        "--to",
+        dest="stop",
+        type=int,
+        default=None,
+        help="Stop before this message number (seeks via the offset index)",
+    )
+    preview_parser.add_argument(
+        "--index",
+        default=None,
+        help="Scan index whose directory holds offset indexes (default: .retro/scan_index.json if present)",
+    )
+    preview_parser.add_argument("--no-index", action="store_true", help="Do not read or write offset indexes")
 
     # raw command
     raw_parser = subparsers.add_parser("raw", help="Read raw content for facet extraction")
@@ -163,29 +1012,180 @@ def main():
         default=50000,
         help="Max chars to read (0=unlimited)",
     )
+    raw_parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Keep user/assistant text, replace tool payloads with size/status stubs",
+    )
+    raw_parser.add_argument(
+        "--passthrough",
+        action="store_true",
+        help="Write valid lines as JSONL bytes (no JSON wrapper, --max-chars counts bytes); "
+        "the summary goes to stderr, or to stdout with --output",
+    )
+    raw_parser.add_argument("--output", default=None, help="With --passthrough, write lines to this file")
+    raw_parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Content-addressed result cache (default: .retro/cache/raw if .retro/ exists)",
+    )
+    raw_parser.add_argument("--no-cache", action="store_true", help="Do not read or write the raw cache")
+    raw_parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=RAW_CACHE_MAX_BYTES >> 20,
+        help=f"Raw cache size cap; least recently used entries are evicted (default: {RAW_CACHE_MAX_BYTES >> 20})",
+    )
+
+    # chunks command
+    chunks_parser = subparsers.add_parser("chunks", help="Split a session into budget-sized chunks")
+    chunks_parser.add_argument("file", help="Path to .jsonl session file")
+    chunks_parser.add_argument(
+        "--chunk-chars",
+        type=int,
+        default=50000,
+        help="Max chars per chunk (default: 50000)",
+    )
+    chunks_parser.add_argument(
+        "--overlap",
+        type=int,
+        default=2,
+        help="Trailing messages repeated at the start of the next chunk (default: 2)",
+    )
+    chunks_parser.add_argument(
+        "--out-dir",
+        default=None,
+        help="Write each chunk to <out-dir>/<session>.chunk-NNNN.jsonl instead of inlining content",
+    )
+    chunks_parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Chunk compacted messages (tool payloads replaced by stubs)",
+    )
 
     # stats command
     stats_parser = subparsers.add_parser("stats", help="Quick stats without reading full content")
     stats_parser.add_argument("file", help="Path to .jsonl session file")
+    stats_parser.add_argument(
+        "--index",
+        default=None,
+        help="Scan index to cache stats in (default: .retro/scan_index.json if present)",
+    )
+    stats_parser.add_argument("--no-index", action="store_true", help="Do not read or write the scan index")
 
-    args = parser.parse_args()
+    # batch command
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Run stats/preview/raw/chunks over many sessions in one process (NDJSON output)",
+    )
+    batch_parser.add_argument("mode", choices=BATCH_MODES, help="What to emit for each session")
+    batch_parser.add_argument(
+        "files",
+        nargs="*",
+        help="Session files (default: read scan_sessions.py JSON/NDJSON output or paths from stdin)",
+    )
+    batch_parser.add_argument("--workers", type=int, default=1, help="Worker processes (default: 1)")
+    batch_parser.add_argument("--max", type=int, default=10, help="preview: max messages per session (0=all)")
+    batch_parser.add_argument("--types", nargs="+", default=None, help="preview: filter by message types")
+    batch_parser.add_argument("--max-chars", type=int, default=50000, help="raw: max chars per session (0=unlimited)")
+    batch_parser.add_argument("--compact", action="store_true", help="raw/chunks: replace tool payloads by stubs")
+    batch_parser.add_argument("--chunk-chars", type=int, default=50000, help="chunks: max chars per chunk")
+    batch_parser.add_argument("--overlap", type=int, default=2, help="chunks: messages repeated between chunks")
+    batch_parser.add_argument("--out-dir", default=None, help="chunks: write chunk content to this directory")
+    batch_parser.add_argument(
+        "--index",
+        default=None,
+        help="stats: scan index to cache stats in (default: .retro/scan_index.json if present)",
+    )
+    batch_parser.add_argument("--no-index", action="store_true", help="stats: do not read or write the scan index")
+    batch_parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="raw: content-addressed result cache (default: .retro/cache/raw if .retro/ exists)",
+    )
+    batch_parser.add_argument("--no-cache", action="store_true", help="raw: do not read or write the raw cache")
+    batch_parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=RAW_CACHE_MAX_BYTES >> 20,
+        help=f"raw: cache size cap in MiB (default: {RAW_CACHE_MAX_BYTES >> 20})",
+    )
+
+    # batch takes files before and after its options; parse_intermixed_args
+    # refuses parsers with subcommands, so batch argv goes to its own parser
+    argv = sys.argv[1:]
+    if argv[:1] == ["batch"]:
+        args = batch_parser.parse_intermixed_args(argv[1:], argparse.Namespace(command="batch"))
+    else:
+        args = parser.parse_args(argv)
+
+    if args.command == "raw" and args.passthrough:
+        if args.compact:
+            parser.error("--passthrough cannot be combined with --compact")
+        if args.output:
+            with open(args.output, "wb") as out:
+                result = passthrough_raw(args.file, out, max_bytes=args.max_chars)
+            summary_stream = sys.stdout
+        else:
+            result = passthrough_raw(args.file, sys.stdout.buffer, max_bytes=args.max_chars)
+            sys.stdout.flush()
+            summary_stream = sys.stderr
+        json.dump(result, summary_stream, ensure_ascii=False)
+        summary_stream.write("\n")
+        return
+    if args.command == "raw" and args.output:
+        parser.error("--output requires --passthrough")
+
+    if args.command == "batch":
+        files = args.files or batch_inputs(sys.stdin.read())
+        opts = {
+            "max": args.max,
+            "types": args.types,
+            "max_chars": args.max_chars,
+            "compact": args.compact,
+            "chunk_chars": args.chunk_chars,
+            "overlap": args.overlap,
+            "out_dir": args.out_dir,
+            "cache_dir": None if args.no_cache else (args.cache_dir or default_raw_cache_dir()),
+            "cache_max_bytes": args.cache_max_mb << 20,
+        }
+        index_path = None if args.no_index else (args.index or default_scan_index_path())
+        errors = 0
+        for _, records in run_batch(args.mode, files, opts, workers=args.workers, index_path=index_path):
+            errors += any("error" in rec for rec in records)
+            for rec in records:
+                sys.stdout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        sys.stdout.write(json.dumps({"summary": {"mode": args.mode, "files": len(files), "errors": errors}}) + "\n")
+        return
+
+    if args.command == "chunks":
+        write_chunks(args.file, args.chunk_chars, args.overlap, args.out_dir, compact=args.compact)
+        return
 
     if args.command == "preview":
-        result = read_session(args.file, max_messages=args.max, types=args.types)
+        if args.start is not None or args.stop is not None:
+            index_path = None if args.no_index else (args.index or default_scan_index_path())
+            result = read_session_range(
+                args.file,
+                start=args.start or 0,
+                stop=args.stop,
+                max_messages=args.max,
+                types=args.types,
+                index_dir=Path(index_path).parent / "offsets" if index_path else None,
+            )
+        else:
+            result = read_session(args.file, max_messages=args.max, types=args.types)
     elif args.command == "raw":
-        result = read_raw(args.file, max_chars=args.max_chars)
+        result = cached_read_raw(
+            args.file,
+            max_chars=args.max_chars,
+            compact=args.compact,
+            cache_dir=None if args.no_cache else (args.cache_dir or default_raw_cache_dir()),
+            max_bytes=args.cache_max_mb << 20,
+        )
     elif args.command == "stats":
-        result = read_session(args.file, max_messages=0, types=None)
-        # Strip messages for stats-only output
-        if "messages" in result:
-            msg_count = len(result["messages"])
-            type_counts = {}
-            for m in result["messages"]:
-                t = m.get("type", "unknown")
-                type_counts[t] = type_counts.get(t, 0) + 1
-            result["message_count"] = msg_count
-            result["type_distribution"] = type_counts
-            del result["messages"]
+        index_path = None if args.no_index else (args.index or default_scan_index_path())
+        result = session_stats(args.file, index_path=index_path)
 
     json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
     print()
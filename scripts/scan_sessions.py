@@ -4,10 +4,41 @@
 import argparse
 import json
 import os
+import re
 import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
+from lib import (
+    SESSION_SUFFIXES,
+    count_nonblank_lines,
+    file_signature,
+    head_digest,
+    is_compressed_session,
+    load_scan_index,
+    open_session,
+    save_scan_index,
+    session_id_from_path,
+    session_suffix,
+    signature_matches,
+)
+
+# Bytes hashed to tell an appended-to transcript from a rewritten one
+HEAD_HASH_BYTES = 4096
+
+# Byte-level pre-filter: the first "type" key of a line, and the first
+# object/array opener. If the key comes before any opener it is top-level.
+_TYPE_KEY_RE = re.compile(rb'"type"\s*:\s*"([^"\\]*)"')
+_NESTING_RE = re.compile(rb"[{\[]")
+_HUMAN_TYPES = (b"human", b"user")
+_PARENT_SESSION_MARKER = b'"parentSessionId"'
+# A "timestamp" key and its value (a plain string, or anything else). Inside
+# a JSON string the key's quotes would be escaped, so every match is a key.
+_TIMESTAMP_KEY_RE = re.compile(rb'"timestamp"\s*:\s*(?:"([^"\\]*)")?')
+_STRING_RE = re.compile(rb'"(?:[^"\\]|\\.)*"')
+
 
 def load_state(state_path: str) -> dict:
     """Load state.json, return empty dict on missing/invalid file."""
@@ -40,9 +71,9 @@ def find_project_dir(project_dir: str) -> Path | None:
     if encoded_name_alt != encoded_name:
         candidates.append(claude_projects / encoded_name_alt)
 
-    # Prefer candidate with actual .jsonl files
+    # Prefer candidate with actual transcripts (.jsonl or compressed archives)
     for candidate in candidates:
-        if candidate.is_dir() and list(candidate.glob("*.jsonl")):
+        if candidate.is_dir() and any(session_suffix(p) for p in candidate.iterdir()):
             return candidate
 
     # Fallback: return first existing directory even if empty
@@ -56,22 +87,96 @@ def find_project_dir(project_dir: str) -> Path | None:
     return None
 
 
+def _decode_line(line: bytes):
+    """json.loads a stripped line, returning None if it is not valid JSON."""
+    try:
+        return json.loads(line.decode("utf-8", "replace"))
+    except json.JSONDecodeError:
+        return None
+
+
+def _human_type_hint(line: bytes) -> bool | None:
+    """Rule out from raw bytes that *line* is a top-level user/human message.
+
+    Returns False when no "type" key anywhere in the line carries a human
+    value (and no \\u escape could hide one), or None when only a full
+    decode can tell: brace framing does not prove the line is one valid
+    object, nor that a later duplicate key does not override the first.
+    """
+    if b"\\u" in line:
+        return None
+    for m in _TYPE_KEY_RE.finditer(line):
+        if m.group(1) in _HUMAN_TYPES:
+            return None
+    return False
+
+
+def _is_human_line(line: bytes) -> bool:
+    """True if stripped *line* is a JSON object with type 'human' or 'user'."""
+    if _human_type_hint(line) is False:
+        return False
+    obj = _decode_line(line)
+    return isinstance(obj, dict) and obj.get("type") in ("human", "user")
+
+
+def _has_parent_session(line: bytes) -> bool:
+    """True if stripped *line* is a JSON object with a parentSessionId key."""
+    if _PARENT_SESSION_MARKER not in line and b"\\u" not in line:
+        return False
+    obj = _decode_line(line)
+    return isinstance(obj, dict) and "parentSessionId" in obj
+
+
+def _is_top_level(line: bytes, pos: int) -> bool:
+    """True if the key starting at *pos* belongs to the outermost object of *line*.
+
+    Settled from the bytes: no opener before the key, or a bracket depth of
+    one once string literals (which may contain brackets) are blanked out.
+    """
+    if not _NESTING_RE.search(line, 1, pos):
+        return True
+    prefix = _STRING_RE.sub(b'""', line[1:pos])
+    return prefix.count(b"{") + prefix.count(b"[") == prefix.count(b"}") + prefix.count(b"]")
+
+
+def _line_timestamp(line: bytes) -> str:
+    """Return the top-level "timestamp" string value of *line*, or "".
+
+    Nested ``timestamp`` keys (tool results, attachments) are ignored. Lines
+    the bytes cannot settle (\\u escapes could hide the key) are decoded.
+    """
+    if line[:1] != b"{" or line[-1:] != b"}":
+        return ""
+    for m in _TIMESTAMP_KEY_RE.finditer(line):
+        if _is_top_level(line, m.start()):
+            return m.group(1).decode("utf-8", "replace") if m.group(1) is not None else ""
+    if b"\\u" not in line:
+        return ""
+    obj = _decode_line(line)
+    ts = obj.get("timestamp") if isinstance(obj, dict) else None
+    return ts if isinstance(ts, str) else ""
+
+
+def timestamp_to_epoch(ts: str) -> float | None:
+    """Parse an ISO-8601 timestamp (``Z`` suffix allowed); naive = local time."""
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+    except (ValueError, TypeError):
+        return None
+
+
 def is_subagent_session(file_path: Path) -> bool:
     """Check if session is a sub-agent session by inspecting first few lines."""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
+        with open_session(file_path) as f:
             for i, line in enumerate(f):
                 if i >= 5:
                     break
                 line = line.strip()
-                if not line:
-                    continue
-                try:
-                    obj = json.loads(line)
-                    if "parentSessionId" in obj:
-                        return True
-                except json.JSONDecodeError:
-                    continue
+                if line and _has_parent_session(line):
+                    return True
     except OSError:
         pass
     return False
@@ -85,102 +190,437 @@ def count_human_messages(file_path: Path) -> int:
     """
     count = 0
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
+        with open_session(file_path) as f:
             for line in f:
                 line = line.strip()
-                if not line:
-                    continue
-                try:
-                    obj = json.loads(line)
-                    if obj.get("type") in ("human", "user"):
-                        count += 1
-                except json.JSONDecodeError:
-                    continue
+                if line and _is_human_line(line):
+                    count += 1
     except OSError as e:
         print(f"Warning: could not read {file_path}: {e}", file=sys.stderr)
     return count
 
 
 def count_total_messages(file_path: Path) -> int:
-    """Count total valid JSON lines in a JSONL file."""
-    count = 0
+    """Count total non-blank lines in a JSONL file."""
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    count += 1
+        return count_nonblank_lines(file_path)
     except OSError:
-        pass
-    return count
+        return 0
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Scan Claude session JSONL files")
-    parser.add_argument("--state", required=True, help="Path to state.json")
-    parser.add_argument("--project-dir", required=True, help="Project directory path")
-    args = parser.parse_args()
+def scan_session_file(file_path: Path, resume: dict | None = None) -> dict:
+    """Classify a session file in a single read.
 
-    state = load_state(args.state)
-    cutoff = state.get("sessions_analyzed_up_to", "") or ""
+    Returns ``{"is_subagent", "human_count", "total_lines"}`` with the same
+    semantics as is_subagent_session / count_human_messages /
+    count_total_messages combined, plus the bookkeeping needed to resume:
+    ``offset`` (end of the last newline-terminated line), ``lines_read``,
+    ``head_len``/``head_hash`` and the contribution of an unterminated last
+    line (``tail_human``/``tail_total``), which is re-read next time.
+    ``last_ts`` is the session's high-water mark: the top-level message
+    timestamp with the latest parsed time (unparseable values are ignored).
 
-    project_sessions_dir = find_project_dir(args.project_dir)
-    if project_sessions_dir is None:
-        json.dump([], sys.stdout)
-        sys.exit(0)
+    If *resume* is a previous result for the same file and the file has only
+    grown since (size not smaller, head hash unchanged), reading starts at
+    the recorded offset instead of byte 0. Stops reading as soon as the file
+    is known to be a sub-agent session (counts are then partial).
 
-    jsonl_files = sorted(project_sessions_dir.glob("*.jsonl"))
-    if not jsonl_files:
-        print("Info: no session files found", file=sys.stderr)
-        json.dump([], sys.stdout)
-        sys.exit(0)
+    Compressed archives are always scanned from the start (offsets are not
+    seekable there) and get no head hash; the caller's signature check on
+    the archive itself is what skips unchanged ones.
+    """
+    result = {
+        "is_subagent": False,
+        "human_count": 0,
+        "total_lines": 0,
+        "offset": 0,
+        "lines_read": 0,
+        "head_len": 0,
+        "head_hash": "",
+        "tail_human": 0,
+        "tail_total": 0,
+        "last_ts": "",
+    }
+    compressed = is_compressed_session(file_path)
+    try:
+        with open_session(file_path) as f:
+            size = os.stat(file_path).st_size
+            if resume and not compressed and 0 < resume.get("offset", 0) <= size:
+                head_len = resume.get("head_len", 0)
+                if head_len and head_digest(f, head_len) == resume.get("head_hash"):
+                    if resume.get("is_subagent"):
+                        return {k: resume.get(k, v) for k, v in result.items()}
+                    for k in result:
+                        result[k] = resume.get(k, result[k])
+                    result["human_count"] -= result["tail_human"]
+                    result["total_lines"] -= result["tail_total"]
+                    result["tail_human"] = result["tail_total"] = 0
+            offset = result["offset"]
+            last_epoch = timestamp_to_epoch(result["last_ts"])
+            if not compressed:
+                f.seek(offset)
+            i = result["lines_read"]
+            for raw in f:
+                terminated = raw.endswith(b"\n")
+                if terminated:
+                    offset += len(raw)
+                    result["offset"] = offset
+                    result["lines_read"] = i + 1
+                line = raw.strip()
+                if line:
+                    # Sub-agent marker only counts within the first 5 lines
+                    if i < 5 and _has_parent_session(line):
+                        result["is_subagent"] = True
+                        break
+                    is_user = _is_human_line(line)
+                    result["total_lines"] += 1
+                    result["human_count"] += is_user
+                    if not terminated:
+                        result["tail_total"] = 1
+                        result["tail_human"] = int(is_user)
+                    ts = _line_timestamp(line)
+                    epoch = timestamp_to_epoch(ts)
+                    if epoch is not None and (last_epoch is None or epoch > last_epoch):
+                        result["last_ts"], last_epoch = ts, epoch
+                i += 1
+            if not compressed:
+                result["head_len"] = min(HEAD_HASH_BYTES, result["offset"])
+                result["head_hash"] = head_digest(f, result["head_len"])
+    except OSError as e:
+        print(f"Warning: could not read {file_path}: {e}", file=sys.stderr)
+    return result
 
-    # Determine cutoff mtime if we have a reference session
-    cutoff_mtime = 0.0
-    if cutoff:
-        # Try to find the cutoff file to get its mtime
-        cutoff_path = project_sessions_dir / (cutoff if cutoff.endswith(".jsonl") else cutoff + ".jsonl")
-        if cutoff_path.exists():
-            cutoff_mtime = cutoff_path.stat().st_mtime
-        else:
-            # Try treating cutoff as a timestamp string (ISO format)
-            try:
-                dt = datetime.fromisoformat(cutoff)
-                cutoff_mtime = dt.timestamp()
-            except (ValueError, TypeError):
-                print(f"Warning: could not resolve cutoff '{cutoff}', including all sessions", file=sys.stderr)
-
-    results = []
-    for fp in jsonl_files:
-        stat = fp.stat()
-        file_mtime = stat.st_mtime
-
-        # Filter by cutoff
-        if cutoff_mtime > 0 and file_mtime <= cutoff_mtime:
-            continue
 
-        # Skip sub-agent sessions
-        if is_subagent_session(fp):
-            continue
+def _scan_chunk(jobs: list) -> list:
+    """Process-pool entry point: scan a chunk of ``(file_path, resume)`` jobs."""
+    return [scan_session_file(file_path, resume=resume) for file_path, resume in jobs]
+
 
-        # Count human messages, skip if < 2
-        human_count = count_human_messages(fp)
-        if human_count < 2:
+def _iter_pool_scans(pool: ProcessPoolExecutor, jobs, chunksize: int, window: int):
+    """Yield scan results for *jobs* in order, with at most *window* chunks in flight.
+
+    Bounding the lookahead lets a consumer that stops early (``--limit``)
+    avoid paying for files it will never look at.
+    """
+    inflight = deque()
+    chunk = []
+    for job in jobs:
+        chunk.append(job)
+        if len(chunk) == chunksize:
+            inflight.append(pool.submit(_scan_chunk, chunk))
+            chunk = []
+            if len(inflight) >= window:
+                yield from inflight.popleft().result()
+    if chunk:
+        inflight.append(pool.submit(_scan_chunk, chunk))
+    while inflight:
+        yield from inflight.popleft().result()
+
+
+def iter_classified(files: list, index_files: dict | None = None, workers: int = 1):
+    """Yield scan_session_file() results for ``(path, stat)`` pairs, in order.
+
+    Unchanged files (same size, mtime_ns and inode as recorded in
+    *index_files*) are never reopened; files that grew in place are resumed
+    from their last offset. Fresh scans are written back into *index_files*.
+    With *workers* > 1 the files that need reading are spread over a
+    process pool in chunks; output order is still the order of *files*.
+    Files are read lazily, so closing the generator early stops the scan.
+    """
+    def jobs():
+        for fp, st in files:
+            entry = index_files.get(str(fp)) if index_files is not None else None
+            if not signature_matches(entry, st):
+                yield fp, (entry if entry and entry.get("inode") == st.st_ino else None)
+
+    pool = None
+    if workers > 1 and len(files) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        chunksize = max(1, min(len(files) // (workers * 4), 32))
+        fresh = _iter_pool_scans(pool, jobs(), chunksize, window=workers * 2)
+    else:
+        fresh = (scan_session_file(fp, resume=resume) for fp, resume in jobs())
+
+    try:
+        for fp, st in files:
+            key = str(fp)
+            entry = index_files.get(key) if index_files is not None else None
+            if signature_matches(entry, st):
+                yield entry
+                continue
+            scan = next(fresh)
+            if index_files is not None:
+                entry = file_signature(st)
+                entry.update(scan)
+                index_files[key] = entry
+            yield scan
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def list_session_files(sessions_dir: Path) -> list:
+    """Return ``(path, stat)`` for every transcript in *sessions_dir*, by name.
+
+    Uses os.scandir so listing and stat'ing take a single directory pass.
+    Compressed archives (``.jsonl.gz``/``.jsonl.zst``) are included; if a
+    session exists both plain and archived, the plain ``.jsonl`` wins.
+    """
+    by_id = {}
+    with os.scandir(sessions_dir) as it:
+        for entry in it:
+            suffix = session_suffix(entry.name)
+            if suffix and not entry.name.startswith(".") and entry.is_file():
+                sid = session_id_from_path(entry.name)
+                if sid not in by_id or suffix == ".jsonl":
+                    by_id[sid] = (Path(entry.path), entry.stat())
+    return sorted(by_id.values(), key=lambda item: item[0].name)
+
+
+def resolve_cutoff(cutoff: str, sessions_dir: Path, index_files: dict | None = None) -> float:
+    """Resolve sessions_analyzed_up_to to an epoch high-water mark.
+
+    A session id resolves to the last message timestamp inside that
+    transcript (falling back to its mtime if it has none), so touching,
+    copying or restoring files does not move the cutoff. Anything else is
+    parsed as an ISO timestamp. Returns 0.0 when there is no cutoff.
+    """
+    if not cutoff:
+        return 0.0
+    # Try to find the cutoff file (plain or archived) to get its last message time
+    sid = session_id_from_path(cutoff) if session_suffix(cutoff) else cutoff
+    cutoff_path = next(
+        (sessions_dir / (sid + suffix) for suffix in SESSION_SUFFIXES if (sessions_dir / (sid + suffix)).exists()),
+        None,
+    )
+    if cutoff_path is not None:
+        stat = cutoff_path.stat()
+        scan = next(iter_classified([(cutoff_path, stat)], index_files))
+        return timestamp_to_epoch(scan.get("last_ts", "")) or stat.st_mtime
+    # Try treating cutoff as a timestamp string (ISO format)
+    epoch = timestamp_to_epoch(cutoff)
+    if epoch is None:
+        print(f"Warning: could not resolve cutoff '{cutoff}', including all sessions", file=sys.stderr)
+        return 0.0
+    return epoch
+
+
+def list_candidates(files: list, cutoff: float, since: float = 0.0) -> list:
+    """Return the ``(path, stat)`` pairs that may be newer than *cutoff*.
+
+    A file cannot hold messages newer than its own mtime, so files last
+    written at or before the cutoff (or before *since*) are skipped without
+    being read. Files with newer mtimes are filtered on their message
+    timestamps later.
+    """
+    candidates = []
+    for fp, stat in files:
+        if cutoff > 0 and stat.st_mtime <= cutoff:
+            continue
+        if since and stat.st_mtime < since:
             continue
+        candidates.append((fp, stat))
+    return candidates
 
-        mtime_date = datetime.fromtimestamp(file_mtime).strftime("%Y-%m-%d")
 
-        results.append({
-            "session_id": fp.stem,
-            "file_path": str(fp),
-            "message_count": count_total_messages(fp),
-            "date": mtime_date,
-            "size_bytes": stat.st_size,
-        })
+def session_epoch(stat: os.stat_result, scan: dict) -> float:
+    """Last message time of a session, or its mtime if it has no timestamps."""
+    return timestamp_to_epoch(scan.get("last_ts", "")) or stat.st_mtime
 
-    # Sort by date ascending
-    results.sort(key=lambda x: x["date"])
 
-    json.dump(results, sys.stdout, indent=2)
+def session_record(fp: Path, stat: os.stat_result, scan: dict) -> dict | None:
+    """Build the output record for a classified file, or None to skip it."""
+    # Skip sub-agent sessions
+    if scan["is_subagent"]:
+        return None
+
+    # Skip if < 2 human messages
+    if scan["human_count"] < 2:
+        return None
+
+    return {
+        "session_id": session_id_from_path(fp),
+        "file_path": str(fp),
+        "message_count": scan["total_lines"],
+        "date": datetime.fromtimestamp(session_epoch(stat, scan)).strftime("%Y-%m-%d"),
+        "size_bytes": stat.st_size,
+    }
+
+
+def prune_index(index_files: dict, sessions_dir: Path, files: list) -> None:
+    """Drop index entries for transcripts deleted from *sessions_dir*."""
+    live = {str(fp) for fp, _ in files}
+    prefix = str(sessions_dir) + os.sep
+    for key in [k for k in index_files if k.startswith(prefix) and k not in live]:
+        del index_files[key]
+
+
+def _dump_empty(args) -> None:
+    """Write the output for a run that found nothing to scan."""
+    if args.format == "ndjson":
+        summary = {"files": 0, "candidates": 0, "sessions": 0, "projects": 0}
+        sys.stdout.write(json.dumps({"summary": summary}) + "\n")
+    else:
+        json.dump({} if args.all_projects else [], sys.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan Claude session JSONL files")
+    parser.add_argument("--state", default=None, help="Path to state.json")
+    parser.add_argument("--project-dir", default=None, help="Project directory path")
+    parser.add_argument(
+        "--all-projects",
+        action="store_true",
+        help="Scan every directory under ~/.claude/projects, grouped by project",
+    )
+    parser.add_argument(
+        "--index",
+        default=None,
+        help="Scan index path (default: scan_index.json next to --state)",
+    )
+    parser.add_argument("--no-index", action="store_true", help="Do not read or write the scan index")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Classify files in N worker processes (default: 1)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "ndjson"],
+        default="json",
+        help="json=one sorted array (default), ndjson=one record per line as classified + summary line",
+    )
+    parser.add_argument("--limit", type=int, default=0, help="Stop after N qualifying sessions (0=all)")
+    parser.add_argument(
+        "--newest-first",
+        action="store_true",
+        help="Scan the most recently modified transcripts first",
+    )
+    parser.add_argument("--since", default=None, help="Only sessions with messages at/after this ISO time")
+    parser.add_argument("--until", default=None, help="Only sessions whose last message is at/before this ISO time")
+    args = parser.parse_args()
+    if not args.all_projects and not (args.state and args.project_dir):
+        parser.error("--state and --project-dir are required unless --all-projects is given")
+    since = until = 0.0
+    if args.since:
+        since = timestamp_to_epoch(args.since)
+        if since is None:
+            parser.error(f"--since: invalid ISO timestamp '{args.since}'")
+    if args.until:
+        until = timestamp_to_epoch(args.until)
+        if until is None:
+            parser.error(f"--until: invalid ISO timestamp '{args.until}'")
+
+    # Scan index lives next to state.json (.retro/scan_index.json) unless
+    # overridden; never create .retro/ just to hold the index.
+    index_path = None
+    if not args.no_index:
+        if args.index:
+            index_path = Path(args.index)
+        elif args.state and Path(args.state).parent.is_dir():
+            index_path = Path(args.state).parent / "scan_index.json"
+    index = load_scan_index(index_path) if index_path else None
+    index_files = index["files"] if index else None
+    index_snapshot = dict(index_files) if index else None
+
+    if args.all_projects:
+        # sessions_analyzed_up_to is per-project, so no cutoff applies here
+        claude_projects = Path.home() / ".claude" / "projects"
+        if not claude_projects.is_dir():
+            print(f"Error: Claude projects directory not found: {claude_projects}", file=sys.stderr)
+            _dump_empty(args)
+            sys.exit(0)
+        project_dirs = sorted(d for d in claude_projects.iterdir() if d.is_dir())
+        cutoff = ""
+    else:
+        state = load_state(args.state)
+        cutoff = state.get("sessions_analyzed_up_to", "") or ""
+        project_sessions_dir = find_project_dir(args.project_dir)
+        if project_sessions_dir is None:
+            _dump_empty(args)
+            sys.exit(0)
+        project_dirs = [project_sessions_dir]
+
+    # Walk every directory first so one pass (and one worker pool) covers all
+    listings = []
+    candidates = []
+    cutoffs = {}
+    for sessions_dir in project_dirs:
+        files = list_session_files(sessions_dir)
+        cutoffs[sessions_dir.name] = resolve_cutoff(cutoff, sessions_dir, index_files)
+        listings.append((sessions_dir, files))
+        candidates.extend(
+            (fp, stat, sessions_dir.name)
+            for fp, stat in list_candidates(files, cutoffs[sessions_dir.name], since)
+        )
+
+    if not args.all_projects and not listings[0][1]:
+        print("Info: no session files found", file=sys.stderr)
+        _dump_empty(args)
+        sys.exit(0)
+
+    # Order from stat data alone, so a limited run reads only what it needs
+    if args.newest_first:
+        candidates.sort(key=lambda c: (c[1].st_mtime_ns, c[0].name), reverse=True)
+    elif args.limit > 0:
+        candidates.sort(key=lambda c: (c[1].st_mtime_ns, c[0].name))
+
+    # One read per file (or none, if the index entry is fresh)
+    ndjson = args.format == "ndjson"
+    grouped = {sessions_dir.name: [] for sessions_dir, _ in listings}
+    found = 0
+    classified = iter_classified([(fp, stat) for fp, stat, _ in candidates], index_files, args.workers)
+    for (fp, stat, owner), scan in zip(candidates, classified):
+        # Filter by the session's own high-water mark, not its mtime
+        last_epoch = session_epoch(stat, scan)
+        if cutoffs[owner] > 0 and last_epoch <= cutoffs[owner]:
+            continue
+        if (since and last_epoch < since) or (until and last_epoch > until):
+            continue
+        record = session_record(fp, stat, scan)
+        if record is None:
+            continue
+        grouped[owner].append(record)
+        found += 1
+        if ndjson:
+            if args.all_projects:
+                record = {"project": owner, **record}
+            # Emit as soon as classified so consumers can start early
+            sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+        if args.limit > 0 and found >= args.limit:
+            break
+    classified.close()
+
+    if index is not None:
+        for sessions_dir, files in listings:
+            prune_index(index_files, sessions_dir, files)
+        if index_files != index_snapshot:
+            try:
+                save_scan_index(index_path, index)
+            except OSError as e:
+                print(f"Warning: could not write scan index {index_path}: {e}", file=sys.stderr)
+
+    if ndjson:
+        summary = {
+            "files": sum(len(files) for _, files in listings),
+            "candidates": len(candidates),
+            "sessions": sum(len(results) for results in grouped.values()),
+            "projects": sum(1 for results in grouped.values() if results),
+        }
+        sys.stdout.write(json.dumps({"summary": summary}) + "\n")
+        return
+
+    for results in grouped.values():
+        # Sort by date ascending
+        results.sort(key=lambda x: x["date"])
+
+    if args.all_projects:
+        output = {name: results for name, results in grouped.items() if results}
+    else:
+        output = grouped[project_dirs[0].name]
+    json.dump(output, sys.stdout, indent=2)
     print()  # trailing newline
 
 
@@ -6,11 +6,13 @@
 """
 
 import argparse
+import hashlib
 import json
 import os
 import re
 import subprocess
 import sys
+import time
 from pathlib import Path
 
 # ---------------------------------------------------------------------------
@@ -21,12 +23,29 @@ if str(_SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(_SCRIPT_DIR))
 
 from lib import (
+    ASSET_FILES,
     INJECTABLE_STATUSES,
-    append_evolution,
+    file_signature,
+    head_digest,
+    is_compressed_session,
+    iter_session_messages,
     load_all_assets,
+    open_session,
+    read_json,
+    retro_dir,
+    session_id_from_path,
+    session_suffix,
+    signature_matches,
     utc_now_iso,
     utc_today_iso,
+    write_json_atomic,
 )
+from manage_assets import update_assets
+
+try:
+    import ahocorasick  # 可选：pyahocorasick（C 实现），缺失时用纯 Python 自动机
+except ImportError:
+    ahocorasick = None
 
 # ---------------------------------------------------------------------------
 # 常量
@@ -45,6 +64,26 @@ MIN_SESSION_LENGTH = 500
 # confidence 告警阈值
 CONFIDENCE_WARN_THRESHOLD = 0.50
 
+# 资产关键词索引 sidecar（memory/ 下），资产文件 mtime/size 变化即重建
+KEYWORD_INDEX_FILE = ".keyword_index.json"
+# 关键词提取口径（正则、停用词）变化时递增，使旧索引失效
+KEYWORD_INDEX_VERSION = 3
+
+# 会话关键词增量状态：.retro/session_keywords/<session_id>.json
+SESSION_STATE_DIR = "session_keywords"
+SESSION_STATE_VERSION = 1
+# 判断 transcript 是否被原地重写（而非追加）时比对的头部字节数
+SESSION_HEAD_BYTES = 4096
+
+# --budget-ms：待扫描字节数按此速率估算耗时，超出预算则整体交给后台 worker（保守取值）
+SCAN_BYTES_PER_MS = 4000
+# 后台队列、worker 锁与耗时日志（均在 .retro/ 下）
+QUEUE_FILE = "session_validate_queue.jsonl"
+DRAIN_LOCK_FILE = "session_validate.lock"
+TIMINGS_FILE = "session_validate_timings.jsonl"
+# worker 异常退出遗留的锁，超过此时长视为失效
+DRAIN_LOCK_STALE_SECONDS = 600
+
 # ---------------------------------------------------------------------------
 # 中文分词辅助：提取关键词
 # ---------------------------------------------------------------------------
@@ -90,6 +129,128 @@ def extract_keywords(text: str) -> set[str]:
     return cn_words | en_words
 
 
+# 引号内的多词短语（"..." “...” 「...」 『...』）整体作为一个匹配模式
+_PHRASE_RE = re.compile(r'"([^"]+)"|“([^”]+)”|「([^」]+)」|『([^』]+)』')
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """匹配前的统一口径：小写 + 连续空白折叠为单个空格。"""
+    return _WHITESPACE_RE.sub(" ", text.lower())
+
+
+def extract_phrases(text: str) -> set[str]:
+    """提取引号内的短语（规范化后至少 2 个字符）。"""
+    if not text or not isinstance(text, str):
+        return set()
+    phrases = set()
+    for groups in _PHRASE_RE.findall(text):
+        phrase = normalize_text("".join(groups)).strip()
+        if len(phrase) >= 2:
+            phrases.add(phrase)
+    return phrases
+
+
+# ---------------------------------------------------------------------------
+# 多模式匹配（Aho–Corasick）
+# ---------------------------------------------------------------------------
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+
+class KeywordMatcher:
+    """一次构建、单遍扫描的多模式匹配器（Aho–Corasick 自动机）。
+
+    模式为 extract_keywords / extract_phrases 产出的关键词与短语。英文端点要求词边界
+    （前后不能紧接 ASCII 字母数字或下划线），中文端点按子串匹配。安装了 pyahocorasick 时
+    使用其 C 实现，否则使用纯 Python 自动机；两者结果一致。
+    """
+
+    def __init__(self, patterns, accelerated: bool = True):
+        self.patterns = sorted({p for p in patterns if p})
+        self.max_len = max(map(len, self.patterns), default=0)
+        self.digest = hashlib.sha1("\n".join(self.patterns).encode("utf-8")).hexdigest()
+        self._bounds = [(_is_word_char(p[0]), _is_word_char(p[-1])) for p in self.patterns]
+        self._automaton = None
+        if accelerated and ahocorasick is not None and self.patterns:
+            automaton = ahocorasick.Automaton()
+            for pid, pattern in enumerate(self.patterns):
+                automaton.add_word(pattern, pid)
+            automaton.make_automaton()
+            self._automaton = automaton
+        else:
+            self._build()
+
+    def _build(self):
+        """纯 Python 自动机：goto 表、失败链接，输出链合并到每个状态。"""
+        goto = [{}]
+        out = [[]]
+        for pid, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                state = nxt
+            out[state].append(pid)
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                # 第一层节点的失败链接固定指向根
+                fail[nxt] = goto[f].get(ch, 0) if state else 0
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto, self._fail, self._out = goto, fail, out
+
+    def _iter_matches(self, text: str):
+        """产出 (结束位置, 模式 id)，含重叠匹配。"""
+        if self._automaton is not None:
+            yield from self._automaton.iter(text)
+            return
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for pid in out[state]:
+                    yield i, pid
+
+    def count(self, text: str) -> dict[str, int]:
+        """单遍扫描 text（先 normalize_text），返回 {模式: 命中次数}，只含命中的模式。"""
+        return self.count_normalized(normalize_text(text)) if text else {}
+
+    def count_normalized(self, text: str, skip: int = 0) -> dict[str, int]:
+        """同 count()，text 须已规范化；结束位置落在前 skip 个字符内的命中不计（仅作上下文）。"""
+        if not self.patterns or not text:
+            return {}
+        n = len(text)
+        counts = {}
+        for end, pid in self._iter_matches(text):
+            if end < skip:
+                continue
+            pattern = self.patterns[pid]
+            left, right = self._bounds[pid]
+            start = end - len(pattern) + 1
+            if left and start > 0 and _is_word_char(text[start - 1]):
+                continue
+            if right and end + 1 < n and _is_word_char(text[end + 1]):
+                continue
+            counts[pattern] = counts.get(pattern, 0) + 1
+        return counts
+
+
 # ---------------------------------------------------------------------------
 # 会话 transcript 读取
 # ---------------------------------------------------------------------------
@@ -106,42 +267,134 @@ def find_latest_transcript(project_dir: str) -> str | None:
     if not claude_sessions.is_dir():
         return None
 
-    jsonl_files = sorted(claude_sessions.glob("*.jsonl"), key=lambda f: f.stat().st_mtime)
+    jsonl_files = sorted(
+        (f for f in claude_sessions.iterdir() if session_suffix(f) and f.is_file()),
+        key=lambda f: f.stat().st_mtime,
+    )
     if not jsonl_files:
         return None
     return str(jsonl_files[-1])
 
 
-def read_session_content(session_file: str) -> str:
-    """从 JSONL transcript 文件中提取文本内容。"""
-    lines = []
-    try:
-        with open(session_file, "r", encoding="utf-8") as f:
-            for raw_line in f:
-                raw_line = raw_line.strip()
-                if not raw_line:
-                    continue
-                try:
-                    entry = json.loads(raw_line)
-                except json.JSONDecodeError:
-                    continue
-                # 提取消息文本（兼容不同格式）
-                msg = entry.get("message", {})
-                if isinstance(msg, str):
-                    lines.append(msg)
-                elif isinstance(msg, dict):
-                    content = msg.get("content", "")
-                    if isinstance(content, str):
-                        lines.append(content)
-                    elif isinstance(content, list):
-                        for part in content:
-                            if isinstance(part, str):
-                                lines.append(part)
-                            elif isinstance(part, dict) and part.get("type") == "text":
-                                lines.append(part.get("text", ""))
-    except OSError:
-        return ""
-    return "\n".join(lines)
+def resolve_transcript(project_dir: str, session_file: str | None) -> str | None:
+    """本次会话的 transcript：优先用 --session-file，否则取最近的一个。"""
+    if session_file and os.path.isfile(session_file):
+        return session_file
+    return find_latest_transcript(project_dir)
+
+
+def session_state_path(project_dir: str, session_file: str) -> Path | None:
+    """会话关键词增量状态文件路径；项目没有 .retro/ 时返回 None（不持久化）。"""
+    rd = retro_dir(project_dir)
+    if not rd.is_dir():
+        return None
+    return rd / SESSION_STATE_DIR / f"{session_id_from_path(session_file)}.json"
+
+
+def _merge_texts(state: dict, matcher: KeywordMatcher, lines) -> None:
+    """解码 lines 中的消息文本并合入 state（text_len / carry / hits）。
+
+    会话文本等价于全部消息文本以换行拼接；carry 是已扫描部分规范化后的末尾
+    max_len 个字符，拼在新文本前作上下文，使跨越边界的命中与整段扫描一致。
+    """
+    # 只取 message 正文；没有 message 的条目（系统提示等）不计入会话文本
+    texts = [text for msg in iter_session_messages(lines) if "message" in msg.entry for text in msg.texts]
+    if not texts:
+        return
+    chunk = "\n".join(texts)
+    if state["text_len"]:
+        state["text_len"] += 1 + len(chunk)
+        text = normalize_text(state["carry"] + "\n" + chunk)
+    else:
+        state["text_len"] = len(chunk)
+        text = normalize_text(chunk)
+    hits = state["hits"]
+    for pattern, n in matcher.count_normalized(text, skip=len(state["carry"])).items():
+        hits[pattern] = hits.get(pattern, 0) + n
+    state["carry"] = text[-matcher.max_len:] if matcher.max_len else ""
+
+
+def scan_session_keywords(
+    session_file: str,
+    matcher: KeywordMatcher,
+    state_path: Path | None = None,
+) -> tuple[int, dict[str, int]]:
+    """统计会话文本长度与各模式命中次数（支持 .jsonl.gz / .jsonl.zst 压缩归档）。
+
+    state_path 给定时按会话持久化扫描进度：只追加内容的 transcript 从上次的字节
+    偏移继续，只解码、匹配新追加的消息；文件被重写、换了 inode 或模式集合变化
+    （digest 不同）时整段重扫。末尾未写完换行的行本次计入结果但不写入状态。
+    压缩归档不可续读，签名未变时直接复用结果。
+    返回: (会话文本长度, {模式: 命中次数})
+    """
+    path = Path(session_file)
+    st = path.stat()
+    compressed = is_compressed_session(path)
+    cached = None
+    if state_path is not None:
+        try:
+            cached = read_json(str(state_path))
+        except (json.JSONDecodeError, OSError):
+            cached = None
+        if (
+            not isinstance(cached, dict)
+            or cached.get("version") != SESSION_STATE_VERSION
+            or cached.get("patterns") != matcher.digest
+        ):
+            cached = None
+    if cached and compressed and signature_matches(cached, st):
+        return cached["text_len"], cached["hits"]
+
+    state = {
+        "version": SESSION_STATE_VERSION,
+        "file": str(path.resolve()),
+        "patterns": matcher.digest,
+        "offset": 0,
+        "text_len": 0,
+        "carry": "",
+        "hits": {},
+    }
+    tail = b""
+    with open_session(path) as f:
+        if (
+            cached
+            and not compressed
+            and cached.get("inode") == st.st_ino
+            and 0 < cached.get("offset", 0) <= st.st_size
+            and cached.get("head_len")
+            and head_digest(f, cached["head_len"]) == cached.get("head_hash")
+        ):
+            state.update(
+                offset=cached["offset"],
+                text_len=cached["text_len"],
+                carry=cached["carry"],
+                hits=dict(cached["hits"]),
+            )
+        pos = state["offset"]
+        if not compressed:
+            f.seek(pos)
+        lines = []
+        for raw in f:
+            if not raw.endswith(b"\n") and not compressed:
+                tail = raw  # 最后一行可能仍在写入
+                break
+            lines.append(raw.decode("utf-8", "replace"))
+            pos += len(raw)
+        _merge_texts(state, matcher, lines)
+        state["offset"] = pos
+        state["head_len"] = 0 if compressed else min(SESSION_HEAD_BYTES, pos)
+        state["head_hash"] = head_digest(f, state["head_len"]) if state["head_len"] else ""
+    state.update(file_signature(st))
+
+    if state_path is not None:
+        try:
+            write_json_atomic(str(state_path), state)
+        except OSError:
+            pass  # 状态写入失败只影响下次的增量
+    if tail:
+        state["hits"] = dict(state["hits"])
+        _merge_texts(state, matcher, [tail.decode("utf-8", "replace")])
+    return state["text_len"], state["hits"]
 
 
 # ---------------------------------------------------------------------------
@@ -149,16 +402,70 @@ def read_session_content(session_file: str) -> str:
 # ---------------------------------------------------------------------------
 
 
-def match_trigger(asset: dict, session_text: str, session_keywords: set[str]) -> tuple[bool, float, list[str]]:
+def compile_asset_keywords(asset: dict) -> dict:
+    """预提取资产的匹配关键词与引号短语（match_trigger / check_compliance 共用）。
+
+    返回 {"trigger": [...], "phrases": [...], "steps": [[...], ...] | None, "pref": [...] | None}：
+    trigger 只含关键词（命中率的分母），trigger 中的引号短语单列在 phrases，只作额外命中上报；
+    gene/sop 按 method/steps 逐条提取（关键词 + 短语），pref 取 rationale + preferred 的关键词，
+    其余类型两者皆为 None。列表形式便于写入 JSON 索引。
+    """
+    asset_type = asset.get("asset_type", "gene")
+    trigger = asset.get("trigger", "")
+    compiled = {
+        "trigger": sorted(extract_keywords(trigger)),
+        "phrases": sorted(extract_phrases(trigger)),
+        "steps": None,
+        "pref": None,
+    }
+
+    if asset_type in ("gene", "sop"):
+        steps = asset.get("method", []) if asset_type == "gene" else asset.get("steps", [])
+        if steps and isinstance(steps, str):
+            steps = [steps]
+        compiled["steps"] = [
+            sorted(_asset_terms(
+                step if isinstance(step, str) else step.get("action", step.get("description", str(step)))
+            ))
+            for step in (steps or [])
+        ]
+    elif asset_type == "pref":
+        compiled["pref"] = sorted(extract_keywords(asset.get("rationale", "")) | extract_keywords(asset.get("preferred", "")))
+    return compiled
+
+
+def _asset_terms(text) -> set[str]:
+    """资产文本的匹配模式：关键词 + 引号短语。"""
+    return extract_keywords(text) | extract_phrases(text)
+
+
+def asset_patterns(compiled: dict) -> set[str]:
+    """compile_asset_keywords() 结果中的全部模式（trigger + phrases + steps + pref）。"""
+    patterns = set(compiled["trigger"])
+    patterns.update(compiled["phrases"])
+    for step_keywords in compiled["steps"] or ():
+        patterns.update(step_keywords)
+    patterns.update(compiled["pref"] or ())
+    return patterns
+
+
+def match_trigger(
+    asset: dict,
+    session_text: str,
+    session_keywords: set[str],
+    compiled: dict | None = None,
+) -> tuple[bool, float, list[str]]:
     """检测资产的 trigger 是否在会话中被触发。
 
+    compiled 为 compile_asset_keywords() 的结果（来自关键词索引），缺省时现场提取。
     返回: (是否触发, 命中率, 命中的关键词列表)
     """
-    trigger = asset.get("trigger", "")
-    if not trigger:
+    if not asset.get("trigger", ""):
         return False, 0.0, []
 
-    trigger_keywords = extract_keywords(trigger)
+    if compiled is None:
+        compiled = compile_asset_keywords(asset)
+    trigger_keywords = set(compiled["trigger"])
     if not trigger_keywords:
         return False, 0.0, []
 
@@ -168,48 +475,36 @@ def match_trigger(asset: dict, session_text: str, session_keywords: set[str]) ->
     return score >= TRIGGER_MATCH_THRESHOLD, score, sorted(matched)
 
 
-def check_compliance(asset: dict, session_text: str, session_keywords: set[str]) -> str:
+def check_compliance(
+    asset: dict,
+    session_text: str,
+    session_keywords: set[str],
+    compiled: dict | None = None,
+) -> str:
     """检测资产的 method/steps 是否在会话中被遵守。
 
+    compiled 含义同 match_trigger。
     返回: "compliant" | "non_compliant" | "ambiguous"
     """
-    asset_type = asset.get("asset_type", "gene")
+    if compiled is None:
+        compiled = compile_asset_keywords(asset)
 
-    # 根据资产类型获取行为描述
-    if asset_type == "gene":
-        steps = asset.get("method", [])
-    elif asset_type == "sop":
-        steps = asset.get("steps", [])
-    elif asset_type == "pref":
+    if compiled["pref"] is not None:
         # 偏好类：检查 rationale 关键词
-        rationale = asset.get("rationale", "")
-        preferred = asset.get("preferred", "")
-        pref_keywords = extract_keywords(rationale) | extract_keywords(preferred)
+        pref_keywords = compiled["pref"]
         if not pref_keywords:
             return "ambiguous"
-        overlap = pref_keywords & session_keywords
+        overlap = session_keywords.intersection(pref_keywords)
         if len(overlap) >= max(1, len(pref_keywords) * 0.3):
             return "compliant"
         return "ambiguous"
-    else:
-        return "ambiguous"
 
     # 对 gene/sop：检查 method/steps 中的行为关键词
+    steps = compiled["steps"]
     if not steps:
         return "ambiguous"
 
-    if isinstance(steps, str):
-        steps = [steps]
-
-    matched_steps = 0
-    for step in steps:
-        step_text = step if isinstance(step, str) else step.get("action", step.get("description", str(step)))
-        step_keywords = extract_keywords(step_text)
-        if step_keywords and (step_keywords & session_keywords):
-            matched_steps += 1
-
-    if not steps:
-        return "ambiguous"
+    matched_steps = sum(1 for step_keywords in steps if not session_keywords.isdisjoint(step_keywords))
 
     rate = matched_steps / len(steps)
     if rate >= 0.5:
@@ -220,6 +515,70 @@ def check_compliance(asset: dict, session_text: str, session_keywords: set[str])
         return "ambiguous"
 
 
+# ---------------------------------------------------------------------------
+# 关键词索引
+# ---------------------------------------------------------------------------
+
+
+def asset_key(asset: dict) -> str:
+    """资产在关键词索引中的键：<asset_type>/<id>。"""
+    return f"{asset.get('asset_type', 'gene')}/{asset.get('id', 'unknown')}"
+
+
+def build_keyword_index(assets: list[dict], sources: dict) -> dict:
+    """为全部资产构建关键词索引。
+
+    assets: 各资产的 compile_asset_keywords() 结果（键重复的资产记为 None，运行时现场提取）；
+    inverted: trigger 关键词 -> 资产键列表。trigger 命中至少需要一个共同关键词，
+    因此只有与会话共享关键词的资产才需要评估。
+    """
+    compiled = {}
+    inverted = {}
+    for asset in assets:
+        key = asset_key(asset)
+        entry = compile_asset_keywords(asset)
+        compiled[key] = None if key in compiled else entry
+        for kw in entry["trigger"]:
+            keys = inverted.setdefault(kw, [])
+            if key not in keys:
+                keys.append(key)
+    return {
+        "version": KEYWORD_INDEX_VERSION,
+        "sources": sources,
+        "assets": compiled,
+        "inverted": inverted,
+    }
+
+
+def load_keyword_index(memory_dir: str, assets: list[dict]) -> dict:
+    """读取 memory/.keyword_index.json；资产文件的 (mtime_ns, size) 有变化时用 assets 重建并写回。
+
+    assets 应为 memory/ 中的全部资产（不按状态过滤）。写入失败不影响本次使用。
+    """
+    sources = {}
+    for filename in ASSET_FILES.values():
+        try:
+            st = os.stat(os.path.join(memory_dir, filename))
+        except OSError:
+            continue
+        sources[filename] = [st.st_mtime_ns, st.st_size]
+
+    index_path = os.path.join(memory_dir, KEYWORD_INDEX_FILE)
+    try:
+        cached = read_json(index_path)
+        if cached.get("version") == KEYWORD_INDEX_VERSION and cached.get("sources") == sources:
+            return cached
+    except (json.JSONDecodeError, OSError, AttributeError):
+        pass
+
+    index = build_keyword_index(assets, sources)
+    try:
+        write_json_atomic(index_path, index)
+    except OSError:
+        pass
+    return index
+
+
 # ---------------------------------------------------------------------------
 # Confidence 更新
 # ---------------------------------------------------------------------------
@@ -239,26 +598,6 @@ def clamp(value: float, lo: float = 0.0, hi: float = 1.0) -> float:
     return max(lo, min(hi, value))
 
 
-def update_asset_confidence(asset_id: str, new_confidence: float, memory_dir: str):
-    """调用 manage_assets.py 更新资产的 confidence。"""
-    manage_script = _SCRIPT_DIR / "manage_assets.py"
-    try:
-        subprocess.run(
-            [
-                sys.executable,
-                str(manage_script),
-                "--memory-dir", memory_dir,
-                "update",
-                "--id", asset_id,
-                "--confidence", str(round(new_confidence, 4)),
-            ],
-            capture_output=True,
-            timeout=5,
-        )
-    except (subprocess.TimeoutExpired, OSError):
-        pass  # 静默失败，不影响用户
-
-
 # ---------------------------------------------------------------------------
 # 主流程
 # ---------------------------------------------------------------------------
@@ -275,34 +614,53 @@ def validate_session(project_dir: str, session_file: str | None, mode: str) -> d
     if not os.path.isdir(memory_dir):
         return None
 
-    assets = load_all_assets(memory_dir, statuses=INJECTABLE_STATUSES)
+    all_assets = load_all_assets(memory_dir)
+    assets = [a for a in all_assets if a.get("status") in INJECTABLE_STATUSES]
     if not assets:
         return None
 
     # 2. 读取本次会话内容
-    if session_file and os.path.isfile(session_file):
-        transcript_path = session_file
-    else:
-        transcript_path = find_latest_transcript(project_dir)
-
+    transcript_path = resolve_transcript(project_dir, session_file)
     if not transcript_path:
         return None
 
-    session_text = read_session_content(transcript_path)
-    if len(session_text) < MIN_SESSION_LENGTH:
+    # 预编译资产模式，对会话文本单遍扫描（一次扫描，多次匹配）；
+    # 扫描进度按会话持久化在 .retro/ 下，重复触发的 hook 只处理新追加的消息
+    keyword_index = load_keyword_index(memory_dir, all_assets)
+    compiled_by_key = {}
+    patterns = set()
+    for asset in assets:
+        key = asset_key(asset)
+        compiled = keyword_index["assets"].get(key) or compile_asset_keywords(asset)
+        compiled_by_key[key] = compiled
+        patterns |= asset_patterns(compiled)
+    matcher = KeywordMatcher(patterns)
+    try:
+        text_len, hits = scan_session_keywords(
+            transcript_path, matcher, session_state_path(project_dir, transcript_path)
+        )
+    except OSError:
         return None
-
-    # 预提取会话关键词（一次提取，多次匹配）
-    session_keywords = extract_keywords(session_text)
+    if text_len < MIN_SESSION_LENGTH:
+        return None
+    session_keywords = set(hits)
 
     # 3-4. 对每个资产做触发匹配 + 合规检测
+    # 关键词索引：只评估与会话至少共享一个 trigger 关键词的资产
+    inverted = keyword_index["inverted"]
+    candidates = {key for kw in session_keywords if kw in inverted for key in inverted[kw]}
+
     triggered_assets = []
     for asset in assets:
-        triggered, score, matched_kw = match_trigger(asset, session_text, session_keywords)
+        key = asset_key(asset)
+        if key not in candidates:
+            continue
+        compiled = compiled_by_key[key]
+        triggered, score, matched_kw = match_trigger(asset, "", session_keywords, compiled)
         if not triggered:
             continue
 
-        compliance = check_compliance(asset, session_text, session_keywords)
+        compliance = check_compliance(asset, "", session_keywords, compiled)
         delta = compute_delta(compliance)
 
         triggered_assets.append({
@@ -311,6 +669,8 @@ def validate_session(project_dir: str, session_file: str | None, mode: str) -> d
             "trigger_match_score": round(score, 2),
             "compliance": compliance,
             "matched_keywords": matched_kw,
+            "matched_phrases": [p for p in compiled["phrases"] if p in session_keywords],
+            "trigger_hits": sum(hits.get(kw, 0) for kw in compiled["trigger"] + compiled["phrases"]),
             "confidence_delta": delta,
             "_current_confidence": float(asset.get("confidence", 0.5)),
         })
@@ -331,6 +691,8 @@ def validate_session(project_dir: str, session_file: str | None, mode: str) -> d
     }
 
     # 6. 如果 mode == "update"，更新 confidence 并写 evolution
+    updates = {}
+    events = []
     for item in triggered_assets:
         asset_id = item["asset_id"]
         delta = item["confidence_delta"]
@@ -338,11 +700,9 @@ def validate_session(project_dir: str, session_file: str | None, mode: str) -> d
         new_conf = clamp(round(current_conf + delta, 4))
 
         if mode == "update" and delta != 0.0:
-            # 更新 confidence
-            update_asset_confidence(asset_id, new_conf, memory_dir)
-
-            # 写入 evolution.jsonl
-            append_evolution(memory_dir, {
+            # 收集 confidence 更新与 evolution 事件，循环结束后一次性写回
+            updates[asset_id] = {"confidence": new_conf}
+            events.append({
                 "ts": utc_now_iso(),
                 "event": "session_validate",
                 "asset_id": asset_id,
@@ -370,10 +730,212 @@ def validate_session(project_dir: str, session_file: str | None, mode: str) -> d
             "trigger_match_score": item["trigger_match_score"],
             "compliance": item["compliance"],
             "matched_keywords": item["matched_keywords"],
+            "matched_phrases": item["matched_phrases"],
+            "trigger_hits": item["trigger_hits"],
             "confidence_delta": item["confidence_delta"],
         }
         result["triggered_assets"].append(output_item)
 
+    # 进程内批量更新：每个资产文件一次原子写 + 一次 evolution 追加
+    if updates:
+        try:
+            update_assets(memory_dir, updates, extra_events=events)
+        except OSError:
+            pass  # 静默失败，不影响用户
+
+    return result
+
+
+# ---------------------------------------------------------------------------
+# 时延预算 + 后台队列
+# ---------------------------------------------------------------------------
+
+
+def pending_session_bytes(project_dir: str, session_file: str) -> int:
+    """估算本次需要扫描的字节数：transcript 大小减去增量状态中已扫描的偏移。
+
+    只比对签名中的 inode 与大小，不读 transcript；压缩归档签名未变时为 0。
+    """
+    st = os.stat(session_file)
+    state_path = session_state_path(project_dir, session_file)
+    if state_path is None:
+        return st.st_size
+    try:
+        state = read_json(str(state_path))
+    except (json.JSONDecodeError, OSError):
+        return st.st_size
+    if not isinstance(state, dict) or state.get("version") != SESSION_STATE_VERSION:
+        return st.st_size
+    if is_compressed_session(session_file):
+        return 0 if signature_matches(state, st) else st.st_size
+    offset = state.get("offset", 0)
+    if state.get("inode") != st.st_ino or not 0 <= offset <= st.st_size:
+        return st.st_size
+    return st.st_size - offset
+
+
+def log_timing(project_dir: str, record: dict) -> None:
+    """追加一条耗时记录到 .retro/session_validate_timings.jsonl（写入失败忽略）。"""
+    try:
+        with open(retro_dir(project_dir) / TIMINGS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"ts": utc_now_iso(), **record}, ensure_ascii=False) + "\n")
+    except OSError:
+        pass
+
+
+def enqueue_job(project_dir: str, session_file: str, mode: str) -> None:
+    """把一次验证追加到 .retro/session_validate_queue.jsonl，由后台 worker 执行。"""
+    job = {"ts": utc_now_iso(), "session_file": os.path.abspath(session_file), "mode": mode}
+    with open(retro_dir(project_dir) / QUEUE_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(job, ensure_ascii=False) + "\n")
+
+
+def spawn_drain_worker(project_dir: str) -> None:
+    """启动脱离当前会话的后台进程执行 --drain-queue，不等待其结束。"""
+    try:
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "--project-dir", project_dir, "--drain-queue"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        pass  # 队列保留，下次 hook 或手动 --drain-queue 时再执行
+
+
+def _acquire_drain_lock(lock_path: Path) -> bool:
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - lock_path.stat().st_mtime < DRAIN_LOCK_STALE_SECONDS:
+                return False
+            lock_path.unlink()
+        except OSError:
+            return False
+        return _acquire_drain_lock(lock_path)
+    os.write(fd, str(os.getpid()).encode())
+    os.close(fd)
+    return True
+
+
+def drain_queue(project_dir: str) -> int:
+    """执行队列中的验证任务，直到队列为空；返回执行的任务数。
+
+    同一时刻只有一个 worker（.retro/session_validate.lock）；队列先整体改名再读取，
+    期间新入队的任务留到下一轮；上一个 worker 中途退出遗留的已改名队列先执行。同一会话同一模式的重复任务只执行最后一个——
+    增量状态保证它覆盖此前追加的全部内容。每个任务的耗时写入 timings 日志。
+    """
+    rd = retro_dir(project_dir)
+    if not rd.is_dir():
+        return 0
+    lock_path = rd / DRAIN_LOCK_FILE
+    queue = rd / QUEUE_FILE
+    claimed = rd / (QUEUE_FILE + ".draining")
+    done = 0
+    while _acquire_drain_lock(lock_path):
+        try:
+            done += _drain_claimed_jobs(project_dir, lock_path, queue, claimed)
+        finally:
+            try:
+                lock_path.unlink()
+            except OSError:
+                pass
+        # 释放锁前刚入队的任务，其 worker 可能因锁仍被持有而已退出：释放后再查一次队列
+        if not queue.exists() and not claimed.exists():
+            break
+    return done
+
+
+def _drain_claimed_jobs(project_dir: str, lock_path: Path, queue: Path, claimed: Path) -> int:
+    """持锁执行队列，直到队列为空；返回执行的任务数。"""
+    done = 0
+    while True:
+        # 持锁时仍存在的 .draining 是上一个 worker 中途退出留下的，先执行它
+        if not claimed.exists():
+            try:
+                os.replace(queue, claimed)
+            except FileNotFoundError:
+                return done
+        jobs = {}
+        with open(claimed, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    job = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(job, dict) and job.get("session_file"):
+                    key = (job["session_file"], job.get("mode", "update"))
+                    jobs.pop(key, None)
+                    jobs[key] = job
+        for (session_file, mode), job in jobs.items():
+            # 每个任务前刷新锁的 mtime，长时间的 drain 不会被当作过期锁抢走
+            try:
+                os.utime(lock_path)
+            except OSError:
+                pass
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                result = validate_session(project_dir, session_file, mode)
+                if result is None:
+                    outcome = "skipped"
+            except Exception:
+                result, outcome = None, "error"
+            log_timing(project_dir, {
+                "phase": "drain",
+                "session": session_id_from_path(session_file),
+                "mode": mode,
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+                "queued_at": job.get("ts"),
+                "triggered": len(result["triggered_assets"]) if result else 0,
+                "outcome": outcome,
+            })
+            done += 1
+        claimed.unlink()
+
+
+def run_hook(project_dir: str, session_file: str | None, mode: str, budget_ms: float) -> dict | None:
+    """带时延预算的 hook 入口。
+
+    预估待扫描字节超出 budget_ms 时，整次验证入队交给后台 worker，本次不输出；
+    否则内联执行 check（关键词匹配 + 合规检测，并推进增量状态），update 模式下
+    有非零 confidence 变化时再把写回入队，由 worker 基于已推进的状态完成。
+    没有 .retro/ 时无处放队列，退回同步执行。
+    """
+    if not retro_dir(project_dir).is_dir():
+        return validate_session(project_dir, session_file, mode)
+    transcript_path = resolve_transcript(project_dir, session_file)
+    if not transcript_path:
+        return None
+
+    start = time.perf_counter()
+    pending = pending_session_bytes(project_dir, transcript_path)
+    deferred = pending / SCAN_BYTES_PER_MS > budget_ms
+    result = None
+    if not deferred:
+        result = validate_session(project_dir, transcript_path, "check")
+    # 只有存在非零 confidence 变化时才有需要交给 worker 的写回
+    has_updates = result is not None and any(a["confidence_delta"] for a in result["triggered_assets"])
+    if deferred or (mode == "update" and has_updates):
+        try:
+            enqueue_job(project_dir, transcript_path, mode)
+        except OSError:
+            pass  # 静默失败，不影响用户
+        else:
+            spawn_drain_worker(project_dir)
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    log_timing(project_dir, {
+        "phase": "deferred" if deferred else "inline",
+        "session": session_id_from_path(transcript_path),
+        "mode": mode,
+        "ms": round(elapsed_ms, 1),
+        "budget_ms": budget_ms,
+        "pending_bytes": pending,
+        "over_budget": elapsed_ms > budget_ms,
+    })
     return result
 
 
@@ -397,11 +959,28 @@ def main():
         default="check",
         help="check=只检查不更新, update=检查并更新 confidence",
     )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=0,
+        help="hook 内联耗时预算（毫秒）；超出预算的扫描与 confidence 写回交给后台 worker。0=全部同步执行",
+    )
+    parser.add_argument(
+        "--drain-queue",
+        action="store_true",
+        help="执行 .retro/ 中排队的验证任务（由 --budget-ms 自动在后台启动）",
+    )
     args = parser.parse_args()
 
     try:
         project_dir = os.path.abspath(args.project_dir)
-        result = validate_session(project_dir, args.session_file, args.mode)
+        if args.drain_queue:
+            drain_queue(project_dir)
+            result = None
+        elif args.budget_ms > 0:
+            result = run_hook(project_dir, args.session_file, args.mode, args.budget_ms)
+        else:
+            result = validate_session(project_dir, args.session_file, args.mode)
         if result is not None:
             json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
             print()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for lib.count_nonblank_lines() — cost per MB of transcript.
+
+Not collected by pytest. Run directly:
+
+    python3 tests/bench_count_lines.py [--mb 200] [--repeat 3]
+
+Writes two synthetic transcripts to a temporary directory (long assistant
+lines and short progress lines) and reports the best-of-N time of
+count_nonblank_lines() next to the plain ``sum(1 for l in f if l.strip())``
+loop it must match.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from lib import count_nonblank_lines  # noqa: E402
+
+SHAPES = {
+    "long lines": {
+        "type": "assistant",
+        "timestamp": "2026-01-01T00:00:00Z",
+        "message": {"role": "assistant", "content": [{"type": "text", "text": "x" * 600}]},
+    },
+    "short lines": {"type": "progress", "timestamp": "2026-01-01T00:00:00Z", "data": {"step": 1}},
+}
+
+
+def plain_count(path) -> int:
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def best_of(repeat: int, fn, path) -> tuple[float, int]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(path)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mb", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, obj in SHAPES.items():
+            line = json.dumps(obj) + "\n"
+            path = os.path.join(tmp, "s.jsonl")
+            with open(path, "w") as f:
+                f.write(line * ((args.mb << 20) // len(line)))
+            for name, fn in (("count_nonblank_lines", count_nonblank_lines), ("sum(l.strip())", plain_count)):
+                seconds, lines = best_of(args.repeat, fn, path)
+                print(f"{label:<12} {name:<22} {seconds * 1e3:8.1f} ms  {seconds * 1e3 / args.mb:6.3f} ms/MB  {lines} lines")
+
+
+if __name__ == "__main__":
+    main()
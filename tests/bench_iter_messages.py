@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for lib.iter_session_messages() — per-message decode cost.
+
+Not collected by pytest. Run directly:
+
+    python3 tests/bench_iter_messages.py [--messages 50000] [--repeat 5]
+
+Reports the best-of-N cost per message for a bare ``json.loads`` loop (the
+floor every reader pays), for building SessionMessage records, and for
+records plus the derived ``text``/``tool_calls`` fields, along with the
+size of one record versus an equivalent per-message dict.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from lib import SessionMessage, iter_session_messages  # noqa: E402
+
+
+def make_lines(n: int) -> list[str]:
+    """A transcript-shaped mix of user, assistant, tool_result and progress lines."""
+    shapes = [
+        {"type": "user", "timestamp": "2026-01-01T00:00:00Z", "message": {"role": "user", "content": "fix the build " * 8}},
+        {
+            "type": "assistant",
+            "timestamp": "2026-01-01T00:00:01Z",
+            "message": {
+                "role": "assistant",
+                "content": [
+                    {"type": "text", "text": "Running the tests first. " * 4},
+                    {"type": "tool_use", "id": "t1", "name": "Bash", "input": {"command": "pytest -q"}},
+                ],
+            },
+        },
+        {
+            "type": "user",
+            "timestamp": "2026-01-01T00:00:02Z",
+            "message": {
+                "role": "user",
+                "content": [{"type": "tool_result", "tool_use_id": "t1", "content": "ok\n" * 40, "is_error": False}],
+            },
+        },
+        {"type": "progress", "timestamp": "2026-01-01T00:00:03Z", "data": {"step": 1}},
+    ]
+    return [json.dumps(shapes[i % len(shapes)]) + "\n" for i in range(n)]
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lines = make_lines(args.messages)
+
+    def loads_only():
+        for line in lines:
+            line = line.strip()
+            if line:
+                json.loads(line)
+
+    def records():
+        for _ in iter_session_messages(lines):
+            pass
+
+    def records_derived():
+        for msg in iter_session_messages(lines):
+            msg.text
+            msg.tool_calls
+
+    results = [
+        ("json.loads only", best_of(args.repeat, loads_only)),
+        ("SessionMessage records", best_of(args.repeat, records)),
+        ("records + text/tool_calls", best_of(args.repeat, records_derived)),
+    ]
+    for label, seconds in results:
+        print(f"{label:<28} {seconds * 1e6 / args.messages:8.2f} us/message")
+
+    msg = next(iter_session_messages(lines[1:2]))
+    as_dict = {name: getattr(msg, name) for name in SessionMessage.__slots__}
+    print(f"{'record size (slots)':<28} {sys.getsizeof(msg):8d} bytes")
+    print(f"{'record size (dict)':<28} {sys.getsizeof(as_dict):8d} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Tests for lib.py — shared transcript message iterator, session counting."""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import lib  # noqa: E402
+
+# ---------------------------------------------------------------------------
+# iter_session_messages
+# ---------------------------------------------------------------------------
+
+
+class TestIterSessionMessages:
+    def test_fields_and_counters(self):
+        lines = [
+            json.dumps({"type": "user", "timestamp": "t1", "message": {"role": "user", "content": "hi"}}),
+            "",
+            "{broken",
+            "[1, 2]",
+            json.dumps(
+                {
+                    "type": "assistant",
+                    "message": {
+                        "role": "assistant",
+                        "content": [
+                            {"type": "text", "text": "ok"},
+                            {"type": "thinking", "thinking": "hmm"},
+                            {"type": "tool_use", "id": "a", "name": "Bash", "input": {"command": "ls"}},
+                            "plain",
+                        ],
+                    },
+                }
+            ),
+            json.dumps({"type": "human", "message": "legacy"}),
+            json.dumps({"type": "progress"}),
+        ]
+        counters = {}
+        msgs = list(lib.iter_session_messages(lines, counters))
+        assert counters == {"total_lines": 7, "parse_errors": 2}
+        assert [m.line_no for m in msgs] == [1, 5, 6, 7]
+        assert [m.role for m in msgs] == ["user", "assistant", "human", "progress"]
+        assert msgs[0].timestamp == "t1" and msgs[0].text == "hi"
+        assert msgs[1].texts == ["ok", "plain"]
+        assert msgs[1].tool_calls == [{"id": "a", "name": "Bash", "input": {"command": "ls"}}]
+        assert msgs[2].text == "legacy" and msgs[2].tool_calls == []
+        assert msgs[3].texts == []
+        assert json.loads(msgs[1].raw) == msgs[1].entry
+
+    def test_records_use_slots(self):
+        msg = next(lib.iter_session_messages(['{"type": "user"}']))
+        assert not hasattr(msg, "__dict__")
+
+
+# ---------------------------------------------------------------------------
+# count_sessions
+# ---------------------------------------------------------------------------
+
+
+class TestCountSessions:
+    def test_counts_archives_once_per_session(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("HOME", str(tmp_path / "home"))
+        project = tmp_path / "proj"
+        project.mkdir()
+        sessions = tmp_path / "home" / ".claude" / "projects" / str(project.resolve()).replace("/", "-")
+        sessions.mkdir(parents=True)
+        for name in ("a.jsonl", "a.jsonl.gz", "b.jsonl.gz", "c.jsonl.zst", "d.json", ".e.jsonl"):
+            (sessions / name).write_bytes(b"")
+        (sessions / "f.jsonl").mkdir()
+        assert lib.count_sessions(str(project)) == 3
+        assert lib.count_sessions(str(tmp_path / "other")) == 0
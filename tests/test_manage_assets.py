@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Tests for manage_assets.py — batch updates."""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import manage_assets  # noqa: E402
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+def write_assets(memory_dir, filename, ids, confidence=0.80):
+    assets = [{"id": i, "confidence": confidence, "status": "provisional", "version": 1} for i in ids]
+    (memory_dir / filename).write_text(json.dumps(assets))
+
+
+def read_assets(memory_dir, filename):
+    return {a["id"]: a for a in json.loads((memory_dir / filename).read_text())}
+
+
+# ---------------------------------------------------------------------------
+# update_assets
+# ---------------------------------------------------------------------------
+
+
+class TestUpdateAssets:
+    def test_one_write_per_file_and_one_append(self, tmp_path, monkeypatch):
+        write_assets(tmp_path, "genes.json", ["g1", "g2", "g3"])
+        write_assets(tmp_path, "sops.json", ["s1"])
+        write_assets(tmp_path, "prefs.json", ["p1"])
+
+        writes = []
+        real_write = manage_assets.write_json_atomic
+        monkeypatch.setattr(
+            manage_assets, "write_json_atomic", lambda path, data: (writes.append(path), real_write(path, data))
+        )
+        extra = [{"event": "session_validate", "asset_id": "g1"}]
+        updated, missing = manage_assets.update_assets(
+            str(tmp_path),
+            {"g1": {"confidence": 0.9}, "g3": {"confidence": 0.3}, "s1": {"confidence": 0.6}, "nope": {"confidence": 1}},
+            extra_events=extra,
+        )
+
+        assert sorted(updated) == ["g1", "g3", "s1"]
+        assert missing == ["nope"]
+        assert sorted(os.path.basename(p) for p in writes) == ["genes.json", "sops.json"]
+
+        genes = read_assets(tmp_path, "genes.json")
+        assert (genes["g1"]["confidence"], genes["g1"]["status"], genes["g1"]["version"]) == (0.9, "active", 2)
+        assert genes["g3"]["status"] == "deprecated"
+        assert genes["g2"] == {"id": "g2", "confidence": 0.80, "status": "provisional", "version": 1}
+
+        events = [json.loads(line) for line in (tmp_path / "evolution.jsonl").read_text().splitlines()]
+        assert [e["event"] for e in events] == ["update", "update", "update", "session_validate"]
+        assert events[0]["changes"]["status_auto"] == {"from": "provisional", "to": "active"}
+
+    def test_nothing_found_writes_nothing(self, tmp_path):
+        write_assets(tmp_path, "genes.json", ["g1"])
+        updated, missing = manage_assets.update_assets(str(tmp_path), {"x": {"confidence": 0.5}})
+        assert (updated, missing) == ({}, ["x"])
+        assert not (tmp_path / "evolution.jsonl").exists()
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""Tests for read_session.py — preview, stats, chunks, compaction, ranged preview, batch, passthrough, compressed input, raw cache."""
+
+import gzip
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import read_session  # noqa: E402
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+def make_transcript(sizes):
+    """Return JSONL text with one message per size (approximate char length)."""
+    lines = []
+    for i, size in enumerate(sizes):
+        lines.append(json.dumps({"type": "user", "n": i, "text": "x" * size}))
+        if i % 4 == 1:
+            lines.append("{not json")
+        if i % 5 == 2:
+            lines.append("")
+    return "\n".join(lines) + "\n"
+
+
+def message(entry):
+    return read_session.SessionMessage(1, entry, json.dumps(entry))
+
+
+def chunk(text, **kwargs):
+    counters = {"parse_errors": 0}
+    chunks = list(read_session.iter_chunks(io.StringIO(text), counters=counters, **kwargs))
+    return chunks, counters
+
+
+# ---------------------------------------------------------------------------
+# preview
+# ---------------------------------------------------------------------------
+
+
+class TestPreview:
+    def test_stops_reading_after_max(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        head = "".join(json.dumps({"type": "user", "n": i, "message": f"m{i}"}) + "\n" for i in range(4))
+        fp.write_text(head + "{corrupt\n" * 50)
+        result = read_session.read_session(str(fp), max_messages=3)
+        assert [m["content"] for m in result["messages"]] == ["m0", "m1", "m2"]
+        assert result["total_lines"] == 4
+        assert result["parse_errors"] == 0
+        assert result["has_more"] is True
+        assert result["total_messages"] == "3 of 4+"
+
+    def test_content_follows_session_message_texts(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        entries = [
+            {"type": "user", "message": {"role": "user", "content": "plain question"}},
+            {
+                "type": "assistant",
+                "message": {
+                    "role": "assistant",
+                    "content": [
+                        {"type": "text", "text": "first"},
+                        {"type": "tool_use", "id": "t1", "name": "Bash", "input": {"text": "not shown"}},
+                        {"type": "text", "text": "second"},
+                    ],
+                },
+            },
+            {"type": "user", "message": {"content": [{"type": "tool_result", "content": "out"}]}},
+            {"type": "assistant", "message": {"content": [{"type": "text", "text": "y" * 600}]}},
+            {"type": "human", "message": "legacy string body"},
+            {"type": "system", "content": "Hook blocked: rm -rf"},
+        ]
+        fp.write_text("".join(json.dumps(e) + "\n" for e in entries))
+        with open(fp) as f:
+            expected = [msg.text for msg in read_session.iter_session_messages(f)]
+        contents = [m["content"] for m in read_session.read_session(str(fp))["messages"]]
+        assert contents[:3] == ["plain question", "first\nsecond", ""]
+        assert contents[3] == "y" * 500 + "... [600 chars total]"
+        assert contents[4] == expected[4] == "legacy string body"
+        assert contents[5] == expected[5] == "Hook blocked: rm -rf"
+        assert [c for i, c in enumerate(contents) if i != 3] == [t for i, t in enumerate(expected) if i != 3]
+
+    def test_no_more_matches(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text(make_transcript([10] * 3))
+        result = read_session.read_session(str(fp), max_messages=3)
+        assert result["total_messages"] == 3
+        assert result["has_more"] is False
+        assert read_session.read_session(str(fp), max_messages=2, types=["assistant"])["total_messages"] == 0
+        assert read_session.read_session(str(fp))["has_more"] is False
+
+
+# ---------------------------------------------------------------------------
+# stats
+# ---------------------------------------------------------------------------
+
+
+class TestStats:
+    def test_counts(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        lines = [
+            '{"type": "user", "message": {"type": "assistant"}}',
+            '{"type": "assistant"}',
+            "",
+            '{"message": "no type"}',
+            '{"type": 3}',
+            "{broken",
+            "[1, 2]",
+            '{"type": "user"}',
+        ]
+        fp.write_text("\n".join(lines) + "\n")
+        result = read_session.session_stats(str(fp))
+        assert result["total_lines"] == 8
+        assert result["parse_errors"] == 2
+        assert result["message_count"] == result["total_messages"] == 5
+        assert result["type_distribution"] == {"user": 2, "assistant": 1, "unknown": 1, "3": 1}
+        assert result["bytes_by_type"]["assistant"] == len(lines[1])
+
+    def test_index_reused_until_file_changes(self, tmp_path, monkeypatch):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text(make_transcript([10] * 3))
+        index_path = tmp_path / "scan_index.json"
+        first = read_session.session_stats(str(fp), index_path=index_path)
+        monkeypatch.setattr(read_session, "open_session", lambda *a, **k: pytest.fail("reopened"))
+        assert read_session.session_stats(str(fp), index_path=index_path) == first
+
+        monkeypatch.undo()
+        with fp.open("a") as f:
+            f.write(json.dumps({"type": "assistant"}) + "\n")
+        assert read_session.session_stats(str(fp), index_path=index_path)["message_count"] == 4
+
+
+# ---------------------------------------------------------------------------
+# chunks
+# ---------------------------------------------------------------------------
+
+
+class TestChunks:
+    @pytest.mark.parametrize("overlap", [0, 1, 3])
+    def test_chunks_cover_every_message_once(self, overlap):
+        text = make_transcript([50, 300, 20, 700, 120, 90, 400, 10, 600])
+        chunks, counters = chunk(text, chunk_chars=800, overlap=overlap)
+
+        rebuilt = []
+        for c in chunks:
+            rebuilt.extend(c["content"].split("\n")[c["overlap_messages"]:])
+        expected = [ln for ln in text.splitlines() if ln.startswith('{"')]
+        assert rebuilt == expected
+        assert [c["chunk_index"] for c in chunks] == list(range(len(chunks)))
+        assert counters["parse_errors"] == 2
+
+    def test_budget_respected(self):
+        text = make_transcript([100] * 30)
+        chunks, _ = chunk(text, chunk_chars=500, overlap=1)
+        assert len(chunks) > 1
+        for c in chunks:
+            assert c["char_count"] <= 500
+            assert c["char_count"] == sum(len(ln) for ln in c["content"].split("\n"))
+            assert not c["oversized"]
+
+    def test_overlap_never_pushes_chunk_over_budget(self):
+        base = len(json.dumps({"type": "user", "text": ""}))
+        text = "".join(json.dumps({"type": "user", "text": "x" * (n - base)}) + "\n" for n in (40, 40, 70))
+        chunks, _ = chunk(text, chunk_chars=100, overlap=1)
+        assert [(c["char_count"], c["overlap_messages"], c["oversized"]) for c in chunks] == [
+            (80, 0, False),
+            (70, 0, False),
+        ]
+
+    @pytest.mark.parametrize("overlap", [1, 2, 5])
+    def test_budget_respected_mixed_sizes(self, overlap):
+        sizes = [(i * 37) % 400 for i in range(60)]
+        text = make_transcript(sizes)
+        chunks, _ = chunk(text, chunk_chars=500, overlap=overlap)
+        for c in chunks:
+            lines = c["content"].split("\n")
+            assert c["char_count"] <= 500 or c["message_count"] == 1
+            assert c["oversized"] == (c["char_count"] > 500)
+            assert c["overlap_chars"] == sum(len(ln) for ln in lines[: c["overlap_messages"]])
+        assert sum(c["message_count"] - c["overlap_messages"] for c in chunks) == len(sizes)
+
+    def test_oversized_message_gets_own_chunk(self):
+        text = make_transcript([10, 2000, 10])
+        chunks, _ = chunk(text, chunk_chars=500, overlap=0)
+        assert [c["message_count"] for c in chunks] == [1, 1, 1]
+        assert [c["oversized"] for c in chunks] == [False, True, False]
+
+    def test_overlap_limited_to_half_budget(self):
+        text = make_transcript([300, 300, 300, 300])
+        chunks, _ = chunk(text, chunk_chars=700, overlap=5)
+        for c in chunks:
+            assert c["overlap_chars"] <= 350
+
+    def test_line_numbers(self):
+        text = make_transcript([10, 10, 10])
+        chunks, _ = chunk(text, chunk_chars=10000)
+        assert len(chunks) == 1
+        assert chunks[0]["start_line"] == 1
+        lines = text.splitlines()
+        assert chunks[0]["end_line"] == max(i for i, ln in enumerate(lines, 1) if ln.startswith('{"'))
+
+
+# ---------------------------------------------------------------------------
+# compaction
+# ---------------------------------------------------------------------------
+
+
+class TestCompaction:
+    def test_tool_payloads_become_stubs(self):
+        tool_names = {}
+        assistant = {
+            "type": "assistant",
+            "timestamp": "2026-03-01T10:00:00Z",
+            "message": {"role": "assistant", "content": [
+                {"type": "text", "text": "running tests"},
+                {"type": "tool_use", "id": "t1", "name": "Bash", "input": {"command": "pytest " * 100}},
+            ]},
+        }
+        result = {
+            "type": "user",
+            "message": {"role": "user", "content": [
+                {"type": "tool_result", "tool_use_id": "t1", "content": "F" * 5000, "is_error": True},
+            ]},
+            "toolUseResult": {"stdout": "F" * 5000},
+        }
+        a = read_session.compact_message(message(assistant), tool_names)
+        r = read_session.compact_message(message(result), tool_names)
+
+        assert a["content"][0] == {"type": "text", "text": "running tests"}
+        assert a["content"][1]["name"] == "Bash"
+        assert a["content"][1]["input_chars"] > 700
+        assert r["content"] == [{"type": "tool_result", "name": "Bash", "status": "error", "output_chars": 5000}]
+        assert "toolUseResult" not in r
+
+    def test_non_conversation_entries_dropped(self):
+        assert read_session.compact_message(message({"type": "progress", "data": {}}), {}) is None
+        assert read_session.compact_message(message({"type": "summary", "summary": "x"}), {}) is None
+
+    def test_top_level_content_kept(self):
+        compact = read_session.compact_message(message({"type": "user", "content": "hi"}), {})
+        assert compact == {"type": "user", "content": "hi"}
+
+    def test_read_raw_reports_ratio(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        lines = [
+            {"type": "user", "message": {"role": "user", "content": "fix the bug"}},
+            {"type": "assistant", "message": {"content": [{"type": "tool_use", "id": "a", "name": "Read", "input": {}}]}},
+            {"type": "user", "message": {"content": [{"type": "tool_result", "tool_use_id": "a", "content": "y" * 4000}]}},
+            {"type": "file-history-snapshot", "snapshot": {"files": "z" * 1000}},
+        ]
+        fp.write_text("\n".join(json.dumps(ln) for ln in lines) + "\n", encoding="utf-8")
+        r = read_session.read_raw(str(fp), max_chars=0, compact=True)
+        assert r["valid_lines"] == 3
+        assert r["compaction"]["dropped_lines"] == 1
+        assert r["compaction"]["ratio"] < 0.1
+        assert "y" * 100 not in r["content"]
+
+
+# ---------------------------------------------------------------------------
+# offset index / --from --to
+# ---------------------------------------------------------------------------
+
+
+class TestOffsetIndex:
+    def test_range_matches_full_preview(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text(make_transcript([10] * 20))
+        full = read_session.read_session(str(fp))["messages"]
+        result = read_session.read_session_range(str(fp), start=5, stop=9, index_dir=tmp_path / "offsets")
+        assert [m["index"] for m in result["messages"]] == [5, 6, 7, 8]
+        assert [{k: m[k] for k in ("type", "content")} for m in result["messages"]] == full[5:9]
+
+    def test_cached_index_extended_on_append(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        index_dir = tmp_path / "offsets"
+        fp.write_text(make_transcript([10] * 6))
+        first = read_session.load_offset_index(fp, index_dir)
+        with open(fp, "a") as f:
+            f.write(json.dumps({"type": "assistant", "text": "tail"}) + "\n")
+            f.write('{"type": "user", "partial"')
+        grown = read_session.load_offset_index(fp, index_dir)
+        assert grown["offsets"][: len(first["offsets"])] == first["offsets"]
+        assert grown["types"][-1] == "assistant"
+        fresh = read_session.load_offset_index(fp)
+        assert grown["offsets"] == fresh["offsets"]
+        assert grown["end"] == fresh["end"]
+
+    def test_rewritten_file_rebuilds(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        index_dir = tmp_path / "offsets"
+        fp.write_text(make_transcript([10] * 6))
+        read_session.load_offset_index(fp, index_dir)
+        fp.write_text(make_transcript([30] * 8))
+        assert read_session.load_offset_index(fp, index_dir)["offsets"] == read_session.load_offset_index(fp)["offsets"]
+
+    def test_out_of_range_is_empty(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text(make_transcript([10] * 3))
+        result = read_session.read_session_range(str(fp), start=50)
+        assert result["messages"] == []
+        assert result["range"] == {"from": 3, "to": 3}
+
+
+# ---------------------------------------------------------------------------
+# batch
+# ---------------------------------------------------------------------------
+
+
+class TestBatch:
+    def test_inputs_from_scan_outputs(self):
+        records = [{"session_id": "a", "file_path": "/x/a.jsonl"}, {"session_id": "b", "file_path": "/x/b.jsonl"}]
+        ndjson = "\n".join(json.dumps(r) for r in records) + '\n{"summary": {"files": 2}}\n'
+        assert read_session.batch_inputs(json.dumps(records)) == ["/x/a.jsonl", "/x/b.jsonl"]
+        assert read_session.batch_inputs(json.dumps({"-x": records})) == ["/x/a.jsonl", "/x/b.jsonl"]
+        assert read_session.batch_inputs(ndjson) == ["/x/a.jsonl", "/x/b.jsonl"]
+        assert read_session.batch_inputs("/x/a.jsonl\n\n/x/b.jsonl\n") == ["/x/a.jsonl", "/x/b.jsonl"]
+
+    def test_results_in_input_order(self, tmp_path):
+        files = []
+        for n in (3, 1, 2):
+            fp = tmp_path / f"s{n}.jsonl"
+            fp.write_text(make_transcript([10] * n))
+            files.append(str(fp))
+        files.append(str(tmp_path / "missing.jsonl"))
+        out = list(read_session.run_batch("stats", files, {}))
+        assert [fp for fp, _ in out] == files
+        assert [recs[0].get("message_count") for _, recs in out] == [3, 1, 2, None]
+        assert "error" in out[-1][1][0]
+
+    def test_stats_index_written_once_and_reused(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text(make_transcript([10] * 4))
+        index_path = str(tmp_path / "scan_index.json")
+        first = list(read_session.run_batch("stats", [str(fp)], {}, index_path=index_path))
+        cached = json.loads((tmp_path / "scan_index.json").read_text())["stats"]
+        assert list(cached) == [str(fp.resolve())]
+        second = list(read_session.run_batch("stats", [str(fp)], {}, index_path=index_path))
+        assert first == second
+
+    def test_repeated_path_with_cached_stats(self, tmp_path):
+        a, b = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+        a.write_text(make_transcript([10] * 2))
+        b.write_text(make_transcript([10] * 3))
+        index_path = str(tmp_path / "scan_index.json")
+        list(read_session.run_batch("stats", [str(a)], {}, index_path=index_path))
+        out = list(read_session.run_batch("stats", [str(a), str(a), str(b)], {}, index_path=index_path))
+        assert [(fp, recs[0]["message_count"]) for fp, recs in out] == [(str(a), 2), (str(a), 2), (str(b), 3)]
+
+    @pytest.mark.parametrize(
+        "argv",
+        [
+            ["stats", "{a}", "{b}", "--index", "{idx}"],
+            ["stats", "--index", "{idx}", "{a}", "{b}"],
+            ["stats", "{a}", "--workers", "2", "{b}"],
+        ],
+    )
+    def test_cli_files_anywhere(self, tmp_path, monkeypatch, capsys, argv):
+        a, b = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+        a.write_text(make_transcript([10] * 2))
+        b.write_text(make_transcript([10] * 3))
+        paths = {"a": str(a), "b": str(b), "idx": str(tmp_path / "idx.json")}
+        monkeypatch.setattr(sys, "argv", ["read_session.py", "batch"] + [arg.format(**paths) for arg in argv])
+        read_session.main()
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert [(r["file"], r["message_count"]) for r in lines[:-1]] == [(str(a), 2), (str(b), 3)]
+        assert lines[-1] == {"summary": {"mode": "stats", "files": 2, "errors": 0}}
+
+    def test_cli_rejects_unknown_options(self, monkeypatch, capsys):
+        monkeypatch.setattr(sys, "argv", ["read_session.py", "batch", "stats", "a.jsonl", "--bogus"])
+        with pytest.raises(SystemExit):
+            read_session.main()
+        assert "unrecognized arguments: --bogus" in capsys.readouterr().err
+
+    def test_cli_stray_positional_on_other_command(self, monkeypatch, capsys):
+        monkeypatch.setattr(sys, "argv", ["read_session.py", "stats", "a.jsonl", "b.jsonl"])
+        with pytest.raises(SystemExit):
+            read_session.main()
+        assert "unrecognized arguments: b.jsonl" in capsys.readouterr().err
+
+
+# ---------------------------------------------------------------------------
+# raw --passthrough
+# ---------------------------------------------------------------------------
+
+
+class TestPassthrough:
+    @pytest.mark.parametrize("block_size", [8, 64, 1 << 20])
+    @pytest.mark.parametrize("max_chars", [0, 120])
+    def test_matches_read_raw(self, tmp_path, block_size, max_chars):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text(make_transcript([5, 40, 0, 12, 70, 3]) + '  {"type": "user"} \r\n{"type": "ass')
+        expected = read_session.read_raw(str(fp), max_chars=max_chars)
+        out = io.BytesIO()
+        result = read_session.passthrough_raw(str(fp), out, max_bytes=max_chars, block_size=block_size)
+        assert out.getvalue().decode() == expected["content"] + "\n"
+        assert result["byte_count"] == expected["char_count"]
+        for key in ("valid_lines", "parse_errors", "truncated"):
+            assert result[key] == expected[key]
+
+    def test_brace_framed_garbage_rejected(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        fp.write_bytes(b'{"type": "user"}\n{garbage}\n{"a": 1} {"b": 2}\n{"t": "caf\xe9"}\n{}\n')
+        expected = read_session.read_raw(str(fp), max_chars=0)
+        out = io.BytesIO()
+        result = read_session.passthrough_raw(str(fp), out)
+        assert out.getvalue() == b'{"type": "user"}\n{"t": "caf\xe9"}\n{}\n'
+        assert (result["valid_lines"], result["parse_errors"]) == (3, 2)
+        assert (expected["valid_lines"], expected["parse_errors"]) == (3, 2)
+
+    def test_missing_file(self, tmp_path):
+        result = read_session.passthrough_raw(str(tmp_path / "nope.jsonl"), io.BytesIO())
+        assert "error" in result
+
+
+# ---------------------------------------------------------------------------
+# compressed transcripts
+# ---------------------------------------------------------------------------
+
+
+def compress(fp, suffix):
+    data = fp.read_bytes()
+    if suffix == ".gz":
+        packed = gzip.compress(data)
+    else:
+        packed = pytest.importorskip("zstandard").ZstdCompressor().compress(data)
+    out = fp.with_name(fp.name + suffix)
+    out.write_bytes(packed)
+    return out
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".zst"])
+class TestCompressed:
+    def test_readers_match_plain(self, tmp_path, suffix):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text(make_transcript([10, 300, 20, 5, 90]))
+        packed = compress(fp, suffix)
+
+        def same(a, b):
+            a.pop("file", None), b.pop("file", None)
+            a.pop("size_bytes", None), b.pop("size_bytes", None)
+            assert a == b
+
+        same(read_session.read_session(str(fp), max_messages=0), read_session.read_session(str(packed), max_messages=0))
+        same(read_session.read_raw(str(fp), compact=True), read_session.read_raw(str(packed), compact=True))
+        same(read_session.session_stats(str(fp)), read_session.session_stats(str(packed)))
+        same(
+            read_session.read_session_range(str(fp), start=2, stop=4),
+            read_session.read_session_range(str(packed), start=2, stop=4),
+        )
+        plain_out, packed_out = io.BytesIO(), io.BytesIO()
+        read_session.passthrough_raw(str(fp), plain_out)
+        read_session.passthrough_raw(str(packed), packed_out)
+        assert plain_out.getvalue() == packed_out.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# raw cache
+# ---------------------------------------------------------------------------
+
+
+class TestRawCache:
+    def test_hit_returns_same_result_without_reading(self, tmp_path, monkeypatch):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text(make_transcript([10, 40, 20]))
+        cache = tmp_path / "cache"
+        first = read_session.cached_read_raw(str(fp), compact=True, cache_dir=cache)
+        assert first == read_session.read_raw(str(fp), compact=True)
+        monkeypatch.setattr(read_session, "read_raw", lambda *a, **k: pytest.fail("cache miss"))
+        assert read_session.cached_read_raw(str(fp), compact=True, cache_dir=cache) == first
+
+    def test_source_range_decides_reuse(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text(make_transcript([30] * 10))
+        cache = tmp_path / "cache"
+        truncated = read_session.cached_read_raw(str(fp), max_chars=100, cache_dir=cache)
+        full = read_session.cached_read_raw(str(fp), max_chars=0, cache_dir=cache)
+        with open(fp, "a") as f:
+            f.write(json.dumps({"type": "user", "text": "new"}) + "\n")
+        # Appending past the truncation point leaves the truncated export valid
+        again = read_session.cached_read_raw(str(fp), max_chars=100, cache_dir=cache)
+        assert again["content"] == truncated["content"]
+        assert again == read_session.read_raw(str(fp), max_chars=100)
+        assert again["size_bytes"] == fp.stat().st_size > truncated["size_bytes"]
+        # ...but an untruncated export must pick up the new line
+        grown = read_session.cached_read_raw(str(fp), max_chars=0, cache_dir=cache)
+        assert grown["valid_lines"] == full["valid_lines"] + 1
+
+    def test_lru_eviction(self, tmp_path):
+        cache = tmp_path / "cache"
+        cache.mkdir()
+        for i, name in enumerate(["old", "mid", "new"]):
+            entry = cache / f"{name}.json"
+            entry.write_text("x" * 100)
+            os.utime(entry, ns=(i * 10**9, i * 10**9))
+        assert read_session.evict_raw_cache(cache, max_bytes=150) == 2
+        assert [p.name for p in cache.iterdir()] == ["new.json"]
+
+    def test_eviction_prunes_range_pointers(self, tmp_path):
+        cache = tmp_path / "cache"
+        for i in range(4):
+            fp = tmp_path / f"s{i}.jsonl"
+            fp.write_text(make_transcript([200 + i] * 5))
+            read_session.cached_read_raw(str(fp), cache_dir=cache, max_bytes=2500)
+        entries = {p.stem for p in cache.glob("*.json")}
+        pointers = [json.loads(p.read_text()) for p in (cache / "ranges").glob("*.json")]
+        assert 0 < len(entries) < 4
+        assert sorted(ptr["entry"] for ptr in pointers) == sorted(entries)
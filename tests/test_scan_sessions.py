@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""Tests for scan_sessions.py — byte pre-filter vs. full JSON decode, timestamps, compressed transcripts, scan index and CLI modes."""
+
+import gzip
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import scan_sessions  # noqa: E402
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+LINES = [
+    # Claude Code style: top-level type before nested message
+    {"parentUuid": None, "cwd": "/x", "type": "user", "message": {"role": "user", "content": "hi"}},
+    {"type": "human", "message": "legacy"},
+    {"type": "assistant", "message": {"content": [{"type": "text", "text": "ok"}]}},
+    # Marker only inside nested content
+    {"type": "progress", "data": {"message": {"type": "user", "content": "nested"}}},
+    {"data": {"type": "user"}, "type": "system"},
+    {"data": {"type": "user"}},
+    {"message": {"content": [{"type": "text", "text": "x"}]}, "type": "user"},
+    # Marker text inside string values
+    {"type": "assistant", "message": "\"type\":\"user\" is a marker"},
+    {"type": "assistant", "message": "ends with type", "subtype": "user"},
+    # Non-ASCII content, with and without escaping
+    {"type": "user", "message": "修改数据库"},
+    {"type": "summary", "summary": "修改 \u001b[31m red"},
+    {"parentSessionId": "abc", "type": "user"},
+    {"type": "user", "parentSessionId": None},
+    {"no_type": True},
+]
+
+RAW_LINES = [
+    b'{"typ\\u0065":"user"}',
+    b'{"type":"us\\u0065r"}',
+    b'{"type" : "user" , "x": 1}',
+    b'{"type":"user"',
+    b'["type", "user"]',
+    b'{"type":"user"} trailing',
+    b'"type"',
+    b'{broken json',
+    b'[{"type":"user"}]',
+    b'{"type":"user",}',
+    b'{"type":"user"}{"x":1}',
+    b'{"type":"user", garbage}',
+    b'{"type":"user","type":"assistant"}',
+    b'{"type":"assistant","type":"user"}',
+]
+
+
+def all_lines():
+    lines = []
+    for obj in LINES:
+        lines.append(json.dumps(obj, separators=(",", ":")).encode())
+        lines.append(json.dumps(obj).encode())
+        lines.append(json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+    return lines + RAW_LINES
+
+
+def session_lines(n_user: int, day: int = 1, hour: int = 10) -> str:
+    """JSONL text with *n_user* user/assistant exchanges timestamped on 2026-03-<day>."""
+    lines = []
+    for i in range(n_user):
+        ts = f"2026-03-{day:02d}T{hour:02d}:{i:02d}:00Z"
+        lines.append({"type": "user", "message": {"role": "user", "content": f"q{i}"}, "timestamp": ts})
+        lines.append({"type": "assistant", "message": {"content": [{"type": "text", "text": "a"}]}, "timestamp": ts})
+    return "".join(json.dumps(obj) + "\n" for obj in lines)
+
+
+def make_home(tmp_path, monkeypatch, projects: dict) -> dict:
+    """Fake ``~/.claude/projects`` with ``{project_dir_name: {session_id: text}}``; returns the dirs."""
+    home = tmp_path / "home"
+    monkeypatch.setenv("HOME", str(home))
+    dirs = {}
+    for name, sessions in projects.items():
+        d = home / ".claude" / "projects" / name
+        d.mkdir(parents=True)
+        for sid, text in sessions.items():
+            (d / f"{sid}.jsonl").write_text(text)
+        dirs[name] = d
+    return dirs
+
+
+def project_home(tmp_path, monkeypatch, sessions: dict):
+    """A project checkout with .retro/state.json and its sessions directory; returns (project, sessions_dir)."""
+    project = tmp_path / "work" / "proj"
+    (project / ".retro").mkdir(parents=True)
+    (project / ".retro" / "state.json").write_text("{}")
+    dirs = make_home(tmp_path, monkeypatch, {str(project).replace("/", "-"): sessions})
+    return project, next(iter(dirs.values()))
+
+
+def run_cli(monkeypatch, capsys, *argv) -> str:
+    monkeypatch.setattr(sys, "argv", ["scan_sessions.py", *map(str, argv)])
+    scan_sessions.main()
+    return capsys.readouterr().out
+
+
+def project_args(project):
+    return ["--state", project / ".retro" / "state.json", "--project-dir", project]
+
+
+def set_mtime(fp, day: int):
+    epoch = scan_sessions.timestamp_to_epoch(f"2026-03-{day:02d}T23:00:00Z")
+    os.utime(fp, (epoch, epoch))
+
+
+def full_decode(line: bytes):
+    try:
+        return json.loads(line.decode("utf-8", "replace"))
+    except json.JSONDecodeError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Pre-filter correctness
+# ---------------------------------------------------------------------------
+
+
+class TestPrefilterMatchesFullDecode:
+    @pytest.mark.parametrize("line", all_lines())
+    def test_human_line(self, line):
+        obj = full_decode(line)
+        expected = isinstance(obj, dict) and obj.get("type") in ("human", "user")
+        assert scan_sessions._is_human_line(line) is expected
+
+    @pytest.mark.parametrize("line", all_lines())
+    def test_hint_never_contradicts_decode(self, line):
+        hint = scan_sessions._human_type_hint(line)
+        obj = full_decode(line)
+        if hint is not None:
+            assert hint is (isinstance(obj, dict) and obj.get("type") in ("human", "user"))
+
+    @pytest.mark.parametrize("line", all_lines())
+    def test_parent_session(self, line):
+        obj = full_decode(line)
+        expected = isinstance(obj, dict) and "parentSessionId" in obj
+        assert scan_sessions._has_parent_session(line) is expected
+
+    def test_only_negatives_skip_decode(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(scan_sessions, "_decode_line", lambda line: calls.append(line))
+        assert not scan_sessions._is_human_line(b'{"type":"assistant","message":{"type":"text"}}')
+        assert not scan_sessions._is_human_line(b'{"cwd":"/x","message":{"role":"user"}}')
+        assert calls == []
+        scan_sessions._is_human_line(b'{"cwd":"/x","type":"user","message":{"type":"text"}}')
+        assert len(calls) == 1
+
+
+class TestScanSessionFile:
+    def test_counts_match_full_decode(self, tmp_path):
+        lines = [ln for ln in all_lines() if b"parentSessionId" not in ln]
+        fp = tmp_path / "s.jsonl"
+        fp.write_bytes(b"\n".join(lines[:1] + [b"", b"   "] + lines[1:]) + b"\n")
+
+        expected = 0
+        for ln in lines:
+            obj = full_decode(ln)
+            expected += isinstance(obj, dict) and obj.get("type") in ("human", "user")
+
+        scan = scan_sessions.scan_session_file(fp)
+        assert scan["is_subagent"] is False
+        assert scan["human_count"] == expected
+        assert scan["total_lines"] == len(lines)
+        assert scan_sessions.count_human_messages(fp) == expected
+
+    def test_subagent_detected(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text('{"type":"user"}\n{"parentSessionId":"p","type":"user"}\n', encoding="utf-8")
+        assert scan_sessions.scan_session_file(fp)["is_subagent"] is True
+        assert scan_sessions.is_subagent_session(fp) is True
+
+    def test_rewritten_plain_file_rescanned_from_start(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        fp.write_text('{"type":"user","a":1}\n' * 3)
+        first = scan_sessions.scan_session_file(fp)
+        fp.write_text('{"type":"user","b":22}\n' * 5)
+        assert scan_sessions.scan_session_file(fp, resume=first)["human_count"] == 5
+
+
+class TestCountTotalMessages:
+    @pytest.mark.parametrize(
+        "data",
+        [b"", b"\n", b"  \n\t\n", b"a", b"a\n\n\nb", b"\r\n{}\r\n  ", b" \n{}\n \n{}", "中\n \n".encode()],
+    )
+    def test_matches_text_iteration(self, tmp_path, data):
+        fp = tmp_path / "s.jsonl"
+        fp.write_bytes(data)
+        with open(fp, "rb") as f:
+            expected = sum(1 for line in f if line.strip())
+        assert scan_sessions.count_total_messages(fp) == expected
+
+
+class TestCompressedTranscripts:
+    def write_pair(self, tmp_path):
+        lines = [ln for ln in all_lines() if b"parentSessionId" not in ln]
+        data = b"\n".join(lines) + b"\n"
+        plain = tmp_path / "plain" / "s.jsonl"
+        packed = tmp_path / "packed" / "s.jsonl.gz"
+        plain.parent.mkdir()
+        packed.parent.mkdir()
+        plain.write_bytes(data)
+        packed.write_bytes(gzip.compress(data))
+        return plain, packed
+
+    def test_scan_matches_plain(self, tmp_path):
+        plain, packed = self.write_pair(tmp_path)
+        for key in ("human_count", "total_lines", "last_ts", "is_subagent"):
+            assert scan_sessions.scan_session_file(packed)[key] == scan_sessions.scan_session_file(plain)[key]
+        assert scan_sessions.count_total_messages(packed) == scan_sessions.count_total_messages(plain)
+
+    def test_listing_prefers_plain_and_strips_suffix(self, tmp_path):
+        (tmp_path / "a.jsonl").write_text("{}\n")
+        (tmp_path / "a.jsonl.gz").write_bytes(gzip.compress(b"{}\n"))
+        (tmp_path / "b.jsonl.gz").write_bytes(gzip.compress(b"{}\n"))
+        (tmp_path / "c.json").write_text("{}\n")
+        files = scan_sessions.list_session_files(tmp_path)
+        assert [fp.name for fp, _ in files] == ["a.jsonl", "b.jsonl.gz"]
+        fp, st = files[1]
+        record = scan_sessions.session_record(fp, st, {"is_subagent": False, "human_count": 2, "total_lines": 2})
+        assert record["session_id"] == "b"
+
+
+class TestLineTimestamp:
+    TOP = "2026-03-01T10:00:00.000Z"
+
+    @pytest.mark.parametrize(
+        "obj",
+        [
+            {"type": "user", "message": {"content": "x"}, "timestamp": TOP, "toolUseResult": {"timestamp": 1712345678}},
+            {"type": "user", "timestamp": TOP, "toolUseResult": {"timestamp": "Tue, 01 Oct 2024"}},
+            {"message": {"content": "[{\"timestamp\": 1}]"}, "timestamp": TOP, "data": [{"timestamp": "zzz"}]},
+            {"data": {"timestamp": "2099-01-01T00:00:00Z"}, "timestamp": TOP},
+        ],
+    )
+    def test_only_top_level_key(self, obj):
+        for line in (json.dumps(obj).encode(), json.dumps(obj, separators=(",", ":")).encode()):
+            assert scan_sessions._line_timestamp(line) == self.TOP
+
+    def test_nested_only_or_escaped(self):
+        assert scan_sessions._line_timestamp(b'{"type":"user","data":{"timestamp":"2026-01-01T00:00:00Z"}}') == ""
+        assert scan_sessions._line_timestamp(b'{"data":{"a":1},"timest\\u0061mp":"2026-01-01T00:00:00Z"}') == (
+            "2026-01-01T00:00:00Z"
+        )
+
+    def test_high_water_mark_ignores_nested_values(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        lines = [
+            {"type": "user", "timestamp": "2026-03-01T10:00:00Z", "toolUseResult": {"timestamp": 1712345678}},
+            {"type": "user", "timestamp": "2026-03-01T11:00:00Z", "toolUseResult": {"timestamp": "Tue, 01 Oct 2024"}},
+            {"type": "assistant", "timestamp": "2026-03-01T10:30:00+00:00"},
+        ]
+        fp.write_text("".join(json.dumps(obj) + "\n" for obj in lines))
+        scan = scan_sessions.scan_session_file(fp)
+        assert scan["last_ts"] == "2026-03-01T11:00:00Z"
+        assert scan_sessions.session_epoch(fp.stat(), scan) == scan_sessions.timestamp_to_epoch("2026-03-01T11:00:00Z")
+
+
+# ---------------------------------------------------------------------------
+# scan index
+# ---------------------------------------------------------------------------
+
+
+class TestScanIndex:
+    def test_unchanged_files_not_reopened(self, tmp_path, monkeypatch):
+        for sid in ("a", "b"):
+            (tmp_path / f"{sid}.jsonl").write_text(session_lines(2))
+        files = scan_sessions.list_session_files(tmp_path)
+        index_files = {}
+        first = list(scan_sessions.iter_classified(files, index_files))
+        assert sorted(index_files) == [str(tmp_path / "a.jsonl"), str(tmp_path / "b.jsonl")]
+
+        monkeypatch.setattr(scan_sessions, "scan_session_file", lambda *a, **k: pytest.fail("reopened"))
+        assert list(scan_sessions.iter_classified(files, index_files)) == [index_files[str(fp)] for fp, _ in files]
+        assert [r["human_count"] for r in first] == [2, 2]
+
+    def test_changed_file_rescanned(self, tmp_path):
+        fp = tmp_path / "a.jsonl"
+        fp.write_text(session_lines(2))
+        index_files = {}
+        list(scan_sessions.iter_classified(scan_sessions.list_session_files(tmp_path), index_files))
+        fp.write_text(session_lines(5))
+        [scan] = scan_sessions.iter_classified(scan_sessions.list_session_files(tmp_path), index_files)
+        assert scan["human_count"] == 5
+        assert index_files[str(fp)]["size"] == fp.stat().st_size
+
+    def test_prune_drops_only_deleted_files_of_that_dir(self, tmp_path):
+        for sid in ("a", "b"):
+            (tmp_path / f"{sid}.jsonl").write_text(session_lines(2))
+        index_files = {"/elsewhere/x.jsonl": {"size": 1}}
+        list(scan_sessions.iter_classified(scan_sessions.list_session_files(tmp_path), index_files))
+        (tmp_path / "a.jsonl").unlink()
+        files = scan_sessions.list_session_files(tmp_path)
+        scan_sessions.prune_index(index_files, tmp_path, files)
+        assert sorted(index_files) == ["/elsewhere/x.jsonl", str(tmp_path / "b.jsonl")]
+
+    def test_cli_rewrites_index_only_when_changed(self, tmp_path, monkeypatch, capsys):
+        project, sessions = project_home(tmp_path, monkeypatch, {"a": session_lines(2), "b": session_lines(3)})
+        saves = []
+        real_save = scan_sessions.save_scan_index
+        monkeypatch.setattr(scan_sessions, "save_scan_index", lambda *a: saves.append(1) or real_save(*a))
+
+        first = run_cli(monkeypatch, capsys, *project_args(project))
+        index_path = project / ".retro" / "scan_index.json"
+        assert sorted(json.loads(index_path.read_text())["files"]) == [
+            str(sessions / "a.jsonl"),
+            str(sessions / "b.jsonl"),
+        ]
+        assert run_cli(monkeypatch, capsys, *project_args(project)) == first
+        assert saves == [1]
+
+        (sessions / "b.jsonl").unlink()
+        run_cli(monkeypatch, capsys, *project_args(project))
+        assert saves == [1, 1]
+        assert list(json.loads(index_path.read_text())["files"]) == [str(sessions / "a.jsonl")]
+
+
+# ---------------------------------------------------------------------------
+# resume from offset
+# ---------------------------------------------------------------------------
+
+RESUME_KEYS = ("is_subagent", "human_count", "total_lines", "last_ts", "offset", "lines_read", "head_hash")
+
+
+def random_line(rng) -> str:
+    ts = f"2026-03-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z"
+    return rng.choice(
+        [
+            json.dumps({"type": "user", "message": {"content": "q" * rng.randint(0, 40)}, "timestamp": ts}),
+            json.dumps({"type": "assistant", "message": {"content": [{"type": "text", "text": "a"}]}, "timestamp": ts}),
+            json.dumps({"type": "progress", "data": {"type": "user", "timestamp": "zzz"}}),
+            json.dumps({"parentSessionId": "p", "type": "user"}),
+            "",
+            "   ",
+            "{broken",
+        ]
+    )
+
+
+class TestResume:
+    @pytest.mark.parametrize("seed", range(12))
+    def test_resume_matches_full_scan(self, tmp_path, seed):
+        rng = random.Random(seed)
+        fp = tmp_path / "s.jsonl"
+        data = "".join(random_line(rng) + "\n" for _ in range(rng.randint(0, 6)))
+        fp.write_text(data)
+        prev = scan_sessions.scan_session_file(fp)
+        for _ in range(25):
+            op = rng.random()
+            if op < 0.55:
+                # Append whole lines, possibly finishing an earlier partial line
+                data += "".join(random_line(rng) + "\n" for _ in range(rng.randint(1, 4)))
+            elif op < 0.8:
+                # Append a partial last line (still being written)
+                line = random_line(rng) + "\n"
+                data += line[: rng.randint(1, len(line))]
+            elif op < 0.9:
+                # Shrink: truncate somewhere before the end
+                data = data[: rng.randint(0, len(data))]
+            else:
+                # Rewrite in place with different content of similar size
+                data = "".join(random_line(rng) + "\n" for _ in range(data.count("\n") + 1))
+            fp.write_text(data)
+            resumed = scan_sessions.scan_session_file(fp, resume=prev)
+            full = scan_sessions.scan_session_file(fp)
+            assert {k: resumed[k] for k in RESUME_KEYS} == {k: full[k] for k in RESUME_KEYS}
+            prev = resumed
+
+    def test_partial_last_line_counted_and_reread(self, tmp_path):
+        fp = tmp_path / "s.jsonl"
+        line = json.dumps({"type": "user", "timestamp": "2026-03-02T00:00:00Z"})
+        fp.write_text(session_lines(2) + line[:10])
+        first = scan_sessions.scan_session_file(fp)
+        assert (first["total_lines"], first["tail_total"]) == (5, 1)
+        assert first["offset"] == len(session_lines(2))
+
+        fp.write_text(session_lines(2) + line + "\n")
+        resumed = scan_sessions.scan_session_file(fp, resume=first)
+        assert (resumed["human_count"], resumed["total_lines"], resumed["tail_total"]) == (3, 5, 0)
+        assert resumed["last_ts"] == "2026-03-02T00:00:00Z"
+
+
+# ---------------------------------------------------------------------------
+# CLI modes
+# ---------------------------------------------------------------------------
+
+
+def many_sessions(n: int = 10) -> dict:
+    sessions = {f"s{day:02d}": session_lines(2 + day % 3, day=day) for day in range(1, n + 1)}
+    sessions["sub"] = json.dumps({"parentSessionId": "p", "type": "user"}) + "\n" + session_lines(3)
+    sessions["short"] = session_lines(1, day=5)
+    return sessions
+
+
+class TestWorkers:
+    @pytest.mark.parametrize("extra", [[], ["--limit", "3"], ["--limit", "4", "--newest-first"]])
+    def test_pool_matches_single_process(self, tmp_path, monkeypatch, capsys, extra):
+        project, sessions = project_home(tmp_path, monkeypatch, many_sessions())
+        for day, fp in enumerate(sorted(sessions.glob("s*.jsonl")), 1):
+            set_mtime(fp, day)
+        outputs, indexes = [], []
+        for workers in (1, 3):
+            index_path = tmp_path / f"index-{workers}.json"
+            argv = project_args(project) + ["--index", index_path, "--workers", workers] + extra
+            outputs.append(run_cli(monkeypatch, capsys, *argv))
+            indexes.append(json.loads(index_path.read_text()))
+        assert outputs[0] == outputs[1]
+        assert indexes[0] == indexes[1]
+        if extra:
+            assert len(json.loads(outputs[0])) == int(extra[1])
+            assert len(indexes[0]["files"]) < len(list(sessions.iterdir()))
+
+
+class TestAllProjects:
+    PROJECTS = {
+        "-work-a": {"a1": session_lines(2, day=3), "a2": session_lines(3, day=1)},
+        "-work-b": {"b1": session_lines(4, day=2), "sub": json.dumps({"parentSessionId": "p"}) + "\n" + session_lines(2)},
+        "-work-empty": {},
+    }
+
+    def test_grouped_output(self, tmp_path, monkeypatch, capsys):
+        make_home(tmp_path, monkeypatch, self.PROJECTS)
+        out = json.loads(run_cli(monkeypatch, capsys, "--all-projects"))
+        assert list(out) == ["-work-a", "-work-b"]
+        assert [r["session_id"] for r in out["-work-a"]] == ["a2", "a1"]
+        assert [(r["session_id"], r["date"]) for r in out["-work-b"]] == [("b1", "2026-03-02")]
+
+    def test_shared_index(self, tmp_path, monkeypatch, capsys):
+        dirs = make_home(tmp_path, monkeypatch, self.PROJECTS)
+        index_path = tmp_path / "index.json"
+        first = run_cli(monkeypatch, capsys, "--all-projects", "--index", index_path)
+        files = json.loads(index_path.read_text())["files"]
+        assert sorted(files) == sorted(str(fp) for d in dirs.values() for fp in d.iterdir())
+
+        monkeypatch.setattr(scan_sessions, "scan_session_file", lambda *a, **k: pytest.fail("reopened"))
+        assert run_cli(monkeypatch, capsys, "--all-projects", "--index", index_path) == first
+
+    def test_missing_projects_dir(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setenv("HOME", str(tmp_path))
+        with pytest.raises(SystemExit):
+            run_cli(monkeypatch, capsys, "--all-projects")
+        assert json.loads(capsys.readouterr().out) == {}
+
+
+class TestNdjson:
+    def parse(self, out):
+        return [json.loads(line) for line in out.splitlines()]
+
+    def test_records_then_summary(self, tmp_path, monkeypatch, capsys):
+        project, _ = project_home(tmp_path, monkeypatch, many_sessions(4))
+        lines = self.parse(run_cli(monkeypatch, capsys, *project_args(project), "--format", "ndjson"))
+        as_json = json.loads(run_cli(monkeypatch, capsys, *project_args(project)))
+        records, summary = lines[:-1], lines[-1]
+        assert sorted(records, key=lambda r: r["date"]) == as_json
+        assert all("project" not in r for r in records)
+        assert summary == {"summary": {"files": 6, "candidates": 6, "sessions": 4, "projects": 1}}
+
+    def test_all_projects_adds_project(self, tmp_path, monkeypatch, capsys):
+        make_home(tmp_path, monkeypatch, TestAllProjects.PROJECTS)
+        lines = self.parse(run_cli(monkeypatch, capsys, "--all-projects", "--format", "ndjson"))
+        assert [(r["project"], r["session_id"]) for r in lines[:-1]] == [
+            ("-work-a", "a1"),
+            ("-work-a", "a2"),
+            ("-work-b", "b1"),
+        ]
+        assert lines[-1] == {"summary": {"files": 4, "candidates": 4, "sessions": 3, "projects": 2}}
+
+    def test_empty_run_emits_summary_only(self, tmp_path, monkeypatch, capsys):
+        monkeypatch.setenv("HOME", str(tmp_path))
+        with pytest.raises(SystemExit):
+            run_cli(monkeypatch, capsys, "--all-projects", "--format", "ndjson")
+        assert self.parse(capsys.readouterr().out) == [
+            {"summary": {"files": 0, "candidates": 0, "sessions": 0, "projects": 0}}
+        ]
+
+
+class TestLimitAndWindow:
+    def setup_sessions(self, tmp_path, monkeypatch, mtime_day=None):
+        sessions = {f"s{day:02d}": session_lines(2, day=day) for day in range(1, 11)}
+        project, sessions_dir = project_home(tmp_path, monkeypatch, sessions)
+        for day, fp in enumerate(sorted(sessions_dir.iterdir()), 1):
+            set_mtime(fp, mtime_day or day)
+        opened = []
+        real_scan = scan_sessions.scan_session_file
+        monkeypatch.setattr(
+            scan_sessions, "scan_session_file", lambda fp, **k: opened.append(fp.stem) or real_scan(fp, **k)
+        )
+        return project, opened
+
+    def ids(self, out):
+        return [r["session_id"] for r in json.loads(out)]
+
+    def test_limit_never_opens_later_files(self, tmp_path, monkeypatch, capsys):
+        project, opened = self.setup_sessions(tmp_path, monkeypatch)
+        out = run_cli(monkeypatch, capsys, *project_args(project), "--no-index", "--limit", "3")
+        assert self.ids(out) == ["s01", "s02", "s03"]
+        assert opened == ["s01", "s02", "s03"]
+
+    def test_newest_first(self, tmp_path, monkeypatch, capsys):
+        project, opened = self.setup_sessions(tmp_path, monkeypatch)
+        out = run_cli(monkeypatch, capsys, *project_args(project), "--no-index", "--limit", "2", "--newest-first")
+        assert sorted(self.ids(out)) == ["s09", "s10"]
+        assert opened == ["s10", "s09"]
+
+    def test_window_uses_message_timestamps(self, tmp_path, monkeypatch, capsys):
+        # Every file touched on the 28th: only the transcripts' own timestamps can place them
+        project, _ = self.setup_sessions(tmp_path, monkeypatch, mtime_day=28)
+        argv = project_args(project) + ["--no-index", "--since", "2026-03-04T00:00:00Z", "--until", "2026-03-06T23:59:59Z"]
+        assert self.ids(run_cli(monkeypatch, capsys, *argv)) == ["s04", "s05", "s06"]
+
+    def test_since_skips_older_mtimes_unread(self, tmp_path, monkeypatch, capsys):
+        project, opened = self.setup_sessions(tmp_path, monkeypatch)
+        out = run_cli(monkeypatch, capsys, *project_args(project), "--no-index", "--since", "2026-03-08T00:00:00Z")
+        assert self.ids(out) == ["s08", "s09", "s10"]
+        assert opened == ["s08", "s09", "s10"]
+
+    def test_invalid_window(self, tmp_path, monkeypatch, capsys):
+        project, _ = self.setup_sessions(tmp_path, monkeypatch)
+        with pytest.raises(SystemExit):
+            run_cli(monkeypatch, capsys, *project_args(project), "--until", "not-a-time")
+        assert "--until: invalid ISO timestamp" in capsys.readouterr().err
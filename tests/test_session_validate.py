@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""Tests for session_validate.py — keyword index and multi-pattern matcher."""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import session_validate  # noqa: E402
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+GENES = [
+    {"id": "g-test", "status": "active", "confidence": 0.9, "trigger": "deploy release pytest", "method": "run pytest"},
+    {"id": "g-helm", "status": "active", "confidence": 0.9, "trigger": "kubernetes helm chart", "method": "helm lint"},
+    {"id": "g-old", "status": "deprecated", "confidence": 0.3, "trigger": "deploy", "method": "x"},
+]
+SOPS = [
+    {
+        "id": "s-release",
+        "status": "provisional",
+        "confidence": 0.7,
+        "trigger": "发布 上线 deploy",
+        "steps": [{"action": "运行 pytest 测试"}, "检查 ruff lint", {"description": "回滚预案"}],
+    },
+]
+PREFS = [
+    {"id": "p-uv", "status": "active", "confidence": 0.9, "trigger": "python install", "rationale": "uv faster"},
+]
+
+SESSION = "我们要发布上线，先 deploy 到 staging。run pytest then ruff lint; python install with uv. " * 10
+
+
+def make_memory(tmp_path):
+    memory = tmp_path / "memory"
+    memory.mkdir()
+    (memory / "genes.json").write_text(json.dumps(GENES, ensure_ascii=False))
+    (memory / "sops.json").write_text(json.dumps(SOPS, ensure_ascii=False))
+    (memory / "prefs.json").write_text(json.dumps(PREFS, ensure_ascii=False))
+    return memory
+
+
+# ---------------------------------------------------------------------------
+# keyword index
+# ---------------------------------------------------------------------------
+
+
+class TestKeywordIndex:
+    def test_compiled_keywords_match_on_the_fly(self, tmp_path):
+        memory = make_memory(tmp_path)
+        assets = session_validate.load_all_assets(str(memory))
+        index = session_validate.load_keyword_index(str(memory), assets)
+        session_keywords = session_validate.extract_keywords(SESSION)
+        for asset in assets:
+            compiled = index["assets"][session_validate.asset_key(asset)]
+            assert session_validate.match_trigger(asset, SESSION, session_keywords, compiled) == (
+                session_validate.match_trigger(asset, SESSION, session_keywords)
+            )
+            assert session_validate.check_compliance(asset, SESSION, session_keywords, compiled) == (
+                session_validate.check_compliance(asset, SESSION, session_keywords)
+            )
+
+    def test_sidecar_reused_until_asset_file_changes(self, tmp_path, monkeypatch):
+        memory = make_memory(tmp_path)
+        assets = session_validate.load_all_assets(str(memory))
+        first = session_validate.load_keyword_index(str(memory), assets)
+        assert (memory / session_validate.KEYWORD_INDEX_FILE).exists()
+
+        builds = []
+        real_build = session_validate.build_keyword_index
+        monkeypatch.setattr(
+            session_validate, "build_keyword_index", lambda *a: builds.append(1) or real_build(*a)
+        )
+        assert session_validate.load_keyword_index(str(memory), assets) == first
+        assert builds == []
+
+        genes = GENES + [{"id": "g-new", "status": "active", "trigger": "terraform plan", "method": "plan"}]
+        (memory / "genes.json").write_text(json.dumps(genes))
+        st = (memory / "genes.json").stat()
+        os.utime(memory / "genes.json", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        rebuilt = session_validate.load_keyword_index(str(memory), session_validate.load_all_assets(str(memory)))
+        assert builds == [1]
+        assert rebuilt["inverted"]["terraform"] == ["gene/g-new"]
+
+    def test_only_candidates_evaluated(self, tmp_path, monkeypatch):
+        memory = make_memory(tmp_path)
+        transcript = tmp_path / "s.jsonl"
+        transcript.write_text(json.dumps({"type": "user", "message": {"role": "user", "content": SESSION}}) + "\n")
+
+        evaluated = []
+        real_match = session_validate.match_trigger
+        monkeypatch.setattr(
+            session_validate,
+            "match_trigger",
+            lambda asset, *a: evaluated.append(asset["id"]) or real_match(asset, *a),
+        )
+        result = session_validate.validate_session(str(tmp_path), str(transcript), "check")
+        # g-helm shares no trigger keyword, g-old is deprecated
+        assert sorted(evaluated) == ["g-test", "p-uv", "s-release"]
+        # "发布"/"上线" occur inside "我们要发布上线" as substrings, so s-release triggers too
+        triggered = {a["asset_id"]: a for a in result["triggered_assets"]}
+        assert sorted(triggered) == ["g-test", "p-uv", "s-release"]
+        assert triggered["s-release"]["trigger_hits"] == 30
+        assert triggered["g-test"]["matched_keywords"] == ["deploy", "pytest"]
+
+
+# ---------------------------------------------------------------------------
+# KeywordMatcher
+# ---------------------------------------------------------------------------
+
+
+def brute_force_count(patterns, text):
+    text = session_validate.normalize_text(text)
+    counts = {}
+    for pattern in patterns:
+        left = session_validate._is_word_char(pattern[0])
+        right = session_validate._is_word_char(pattern[-1])
+        start = text.find(pattern)
+        while start != -1:
+            end = start + len(pattern)
+            if not (left and start > 0 and session_validate._is_word_char(text[start - 1])) and not (
+                right and end < len(text) and session_validate._is_word_char(text[end])
+            ):
+                counts[pattern] = counts.get(pattern, 0) + 1
+            start = text.find(pattern, start + 1)
+    return counts
+
+
+class TestKeywordMatcher:
+    def test_english_word_boundaries(self):
+        matcher = session_validate.KeywordMatcher(["test", "pytest", "lint"], accelerated=False)
+        assert matcher.count("Run PYTEST, then test_all and lint; lint-fix testing") == {
+            "pytest": 1,
+            "lint": 2,
+        }
+
+    def test_cjk_substring_and_overlaps(self):
+        matcher = session_validate.KeywordMatcher(["发布", "布上", "上线", "发布上线"], accelerated=False)
+        assert matcher.count("准备发布上线") == {"发布": 1, "布上": 1, "上线": 1, "发布上线": 1}
+
+    def test_quoted_phrases(self):
+        assert session_validate.extract_phrases('always "Run  the Tests" before 「代码 评审」') == {
+            "run the tests",
+            "代码 评审",
+        }
+        compiled = session_validate.compile_asset_keywords({"trigger": '"dry run" terraform'})
+        assert compiled["trigger"] == ["dry", "run", "terraform"]
+        assert compiled["phrases"] == ["dry run"]
+        matcher = session_validate.KeywordMatcher(session_validate.asset_patterns(compiled), accelerated=False)
+        assert matcher.count("terraform plan as a Dry\n Run") == {"terraform": 1, "dry run": 1, "dry": 1, "run": 1}
+
+    @pytest.mark.parametrize(
+        "trigger, session_keywords",
+        [
+            ('when "deploy prod" fails', {"deploy", "fails"}),
+            ('"blue green" rollout canary', {"rollout"}),
+        ],
+    )
+    def test_phrases_do_not_change_trigger_score(self, trigger, session_keywords):
+        asset = {"trigger": trigger}
+        words = session_validate.extract_keywords(trigger)
+        expected = len(words & session_keywords) / len(words)
+        triggered, score, matched = session_validate.match_trigger(asset, "", session_keywords)
+        assert score == expected
+        assert triggered is (expected >= session_validate.TRIGGER_MATCH_THRESHOLD)
+        assert matched == sorted(words & session_keywords)
+
+    def test_phrase_hits_reported_separately(self, tmp_path):
+        memory = tmp_path / "memory"
+        memory.mkdir()
+        gene = {"id": "g-dry", "status": "active", "trigger": '"dry run" terraform', "method": "plan"}
+        (memory / "genes.json").write_text(json.dumps([gene]))
+        transcript = tmp_path / "s.jsonl"
+        text = "terraform plan as a dry run, " * 20
+        transcript.write_text(json.dumps({"type": "user", "message": {"content": text}}) + "\n")
+        result = session_validate.validate_session(str(tmp_path), str(transcript), "check")
+        (item,) = result["triggered_assets"]
+        assert item["trigger_match_score"] == 1.0
+        assert item["matched_keywords"] == ["dry", "run", "terraform"]
+        assert item["matched_phrases"] == ["dry run"]
+        assert item["trigger_hits"] == 80
+
+    def test_pure_matches_brute_force(self):
+        patterns = ["he", "she", "his", "hers", "部署", "部署脚本", "脚本", "a_b", "ab"]
+        text = "ushers said his hers a_b ab abab 部署脚本部署 she_he " * 3
+        matcher = session_validate.KeywordMatcher(patterns, accelerated=False)
+        assert matcher.count(text) == brute_force_count(patterns, text)
+
+    def test_accelerated_matches_pure(self):
+        pytest.importorskip("ahocorasick")
+        patterns = session_validate.extract_keywords(SESSION) | {"发布", "上线", "run pytest"}
+        pure = session_validate.KeywordMatcher(patterns, accelerated=False)
+        fast = session_validate.KeywordMatcher(patterns)
+        assert fast._automaton is not None
+        assert fast.count(SESSION) == pure.count(SESSION)
+
+
+# ---------------------------------------------------------------------------
+# incremental session keyword state
+# ---------------------------------------------------------------------------
+
+
+def user_line(text):
+    return json.dumps({"type": "user", "message": {"role": "user", "content": text}}, ensure_ascii=False) + "\n"
+
+
+def full_scan(matcher, messages):
+    text = "\n".join(messages)
+    return len(text), matcher.count(text)
+
+
+class TestSessionKeywordState:
+    PATTERNS = ["dry run", "发布", "pytest", "deploy"]
+    MESSAGES = ["we deploy with a dry", "run first, 发布前跑 pytest", "", "Deploy  DRY\tRUN again 发", "布 pytest"]
+
+    def test_appended_tail_matches_full_scan(self, tmp_path):
+        matcher = session_validate.KeywordMatcher(self.PATTERNS, accelerated=False)
+        transcript = tmp_path / "s.jsonl"
+        state = tmp_path / "state.json"
+        transcript.write_text("")
+        for i, message in enumerate(self.MESSAGES, 1):
+            with transcript.open("a") as f:
+                f.write(user_line(message))
+            result = session_validate.scan_session_keywords(str(transcript), matcher, state)
+            assert result == full_scan(matcher, [m for m in self.MESSAGES[:i] if m])
+        assert json.loads(state.read_text())["offset"] == transcript.stat().st_size
+
+    def test_only_tail_is_decoded(self, tmp_path, monkeypatch):
+        matcher = session_validate.KeywordMatcher(self.PATTERNS, accelerated=False)
+        transcript = tmp_path / "s.jsonl"
+        state = tmp_path / "state.json"
+        transcript.write_text("".join(user_line(m) for m in self.MESSAGES[:3]))
+        session_validate.scan_session_keywords(str(transcript), matcher, state)
+
+        decoded = []
+        real_iter = session_validate.iter_session_messages
+
+        def recording_iter(lines):
+            lines = list(lines)
+            decoded.extend(lines)
+            return real_iter(lines)
+
+        monkeypatch.setattr(session_validate, "iter_session_messages", recording_iter)
+        with transcript.open("a") as f:
+            f.write(user_line(self.MESSAGES[3]))
+        session_validate.scan_session_keywords(str(transcript), matcher, state)
+        assert decoded == [user_line(self.MESSAGES[3])]
+
+    def test_unterminated_line_counted_but_not_persisted(self, tmp_path):
+        matcher = session_validate.KeywordMatcher(self.PATTERNS, accelerated=False)
+        transcript = tmp_path / "s.jsonl"
+        state = tmp_path / "state.json"
+        transcript.write_text(user_line(self.MESSAGES[0]) + user_line(self.MESSAGES[1]).rstrip("\n"))
+        assert session_validate.scan_session_keywords(str(transcript), matcher, state) == full_scan(
+            matcher, self.MESSAGES[:2]
+        )
+        assert json.loads(state.read_text())["offset"] == len(user_line(self.MESSAGES[0]).encode())
+
+        with transcript.open("a") as f:
+            f.write("\n" + user_line(self.MESSAGES[3]))
+        assert session_validate.scan_session_keywords(str(transcript), matcher, state) == full_scan(
+            matcher, [self.MESSAGES[0], self.MESSAGES[1], self.MESSAGES[3]]
+        )
+
+    def test_rewrite_or_new_patterns_rescan(self, tmp_path):
+        matcher = session_validate.KeywordMatcher(self.PATTERNS, accelerated=False)
+        transcript = tmp_path / "s.jsonl"
+        state = tmp_path / "state.json"
+        transcript.write_text("".join(user_line(m) for m in self.MESSAGES))
+        session_validate.scan_session_keywords(str(transcript), matcher, state)
+
+        rewritten = ["pytest only", "and more text than before to grow the file"] * 3
+        transcript.write_text("".join(user_line(m) for m in rewritten))
+        assert session_validate.scan_session_keywords(str(transcript), matcher, state) == full_scan(
+            matcher, rewritten
+        )
+
+        other = session_validate.KeywordMatcher(["text", "grow"], accelerated=False)
+        assert session_validate.scan_session_keywords(str(transcript), other, state) == full_scan(other, rewritten)
+
+    def test_validate_session_persists_state(self, tmp_path):
+        make_memory(tmp_path)
+        (tmp_path / ".retro").mkdir()
+        transcript = tmp_path / "abc.jsonl"
+        transcript.write_text(user_line(SESSION))
+        first = session_validate.validate_session(str(tmp_path), str(transcript), "check")
+        state_file = tmp_path / ".retro" / session_validate.SESSION_STATE_DIR / "abc.json"
+        assert json.loads(state_file.read_text())["offset"] == transcript.stat().st_size
+
+        with transcript.open("a") as f:
+            f.write(user_line("helm chart for kubernetes"))
+        second = session_validate.validate_session(str(tmp_path), str(transcript), "check")
+        hits = {a["asset_id"]: a["trigger_hits"] for a in second["triggered_assets"]}
+        assert hits == {a["asset_id"]: a["trigger_hits"] for a in first["triggered_assets"]} | {"g-helm": 3}
+
+
+# ---------------------------------------------------------------------------
+# --budget-ms / background queue
+# ---------------------------------------------------------------------------
+
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestBudget:
+    @pytest.fixture
+    def project(self, tmp_path, monkeypatch):
+        make_memory(tmp_path)
+        (tmp_path / ".retro").mkdir()
+        transcript = tmp_path / "abc.jsonl"
+        transcript.write_text(user_line(SESSION))
+        spawned = []
+        monkeypatch.setattr(session_validate, "spawn_drain_worker", spawned.append)
+        return tmp_path, transcript, spawned
+
+    def test_over_budget_defers_everything(self, project, monkeypatch):
+        tmp_path, transcript, spawned = project
+        monkeypatch.setattr(session_validate, "SCAN_BYTES_PER_MS", 1)
+        assert session_validate.run_hook(str(tmp_path), str(transcript), "check", 10) is None
+        assert spawned == [str(tmp_path)]
+        [job] = read_jsonl(tmp_path / ".retro" / session_validate.QUEUE_FILE)
+        assert job["session_file"] == str(transcript) and job["mode"] == "check"
+        [timing] = read_jsonl(tmp_path / ".retro" / session_validate.TIMINGS_FILE)
+        assert timing["phase"] == "deferred" and timing["pending_bytes"] == transcript.stat().st_size
+        assert not (tmp_path / ".retro" / session_validate.SESSION_STATE_DIR).exists()
+
+    def test_inline_check_then_update_drained(self, project):
+        tmp_path, transcript, spawned = project
+        genes_before = (tmp_path / "memory" / "genes.json").read_text()
+        result = session_validate.run_hook(str(tmp_path), str(transcript), "update", 1000)
+        assert sorted(a["asset_id"] for a in result["triggered_assets"]) == ["g-test", "p-uv", "s-release"]
+        assert (tmp_path / "memory" / "genes.json").read_text() == genes_before
+        assert session_validate.pending_session_bytes(str(tmp_path), str(transcript)) == 0
+        assert spawned == [str(tmp_path)]
+
+        assert session_validate.drain_queue(str(tmp_path)) == 1
+        genes = {g["id"]: g for g in json.loads((tmp_path / "memory" / "genes.json").read_text())}
+        assert genes["g-test"]["confidence"] == 0.92
+        assert not (tmp_path / ".retro" / session_validate.QUEUE_FILE).exists()
+        timings = read_jsonl(tmp_path / ".retro" / session_validate.TIMINGS_FILE)
+        assert [t["phase"] for t in timings] == ["inline", "drain"]
+        assert timings[1]["outcome"] == "ok" and timings[1]["triggered"] == 3
+
+    def test_check_within_budget_enqueues_nothing(self, project):
+        tmp_path, transcript, spawned = project
+        assert session_validate.run_hook(str(tmp_path), str(transcript), "check", 1000) is not None
+        assert spawned == []
+        assert not (tmp_path / ".retro" / session_validate.QUEUE_FILE).exists()
+
+    def test_update_without_confidence_change_enqueues_nothing(self, project):
+        tmp_path, transcript, spawned = project
+        memory = tmp_path / "memory"
+        (memory / "genes.json").write_text("[]")
+        (memory / "sops.json").write_text("[]")
+        prefs = [{"id": "p-x", "status": "active", "confidence": 0.9, "trigger": "python install", "rationale": "zq"}]
+        (memory / "prefs.json").write_text(json.dumps(prefs))
+        result = session_validate.run_hook(str(tmp_path), str(transcript), "update", 1000)
+        assert [(a["asset_id"], a["confidence_delta"]) for a in result["triggered_assets"]] == [("p-x", 0.0)]
+        assert spawned == []
+        assert not (tmp_path / ".retro" / session_validate.QUEUE_FILE).exists()
+
+    def test_leftover_claimed_queue_drained_first(self, project):
+        tmp_path, transcript, _ = project
+        retro = tmp_path / ".retro"
+        session_validate.enqueue_job(str(tmp_path), str(transcript), "update")
+        os.replace(retro / session_validate.QUEUE_FILE, retro / (session_validate.QUEUE_FILE + ".draining"))
+        session_validate.enqueue_job(str(tmp_path), str(transcript), "check")
+
+        assert session_validate.drain_queue(str(tmp_path)) == 2
+        assert [t["mode"] for t in read_jsonl(retro / session_validate.TIMINGS_FILE)] == ["update", "check"]
+        assert not (retro / (session_validate.QUEUE_FILE + ".draining")).exists()
+        genes = {g["id"]: g for g in json.loads((tmp_path / "memory" / "genes.json").read_text())}
+        assert genes["g-test"]["confidence"] == 0.92
+
+    def test_drain_dedupes_and_respects_lock(self, project):
+        tmp_path, transcript, _ = project
+        for _ in range(3):
+            session_validate.enqueue_job(str(tmp_path), str(transcript), "check")
+        lock = tmp_path / ".retro" / session_validate.DRAIN_LOCK_FILE
+        lock.write_text("1")
+        assert session_validate.drain_queue(str(tmp_path)) == 0
+
+        lock.unlink()
+        assert session_validate.drain_queue(str(tmp_path)) == 1
+        assert not lock.exists()
+
+    def test_job_enqueued_before_lock_release_is_drained(self, project, monkeypatch):
+        tmp_path, transcript, _ = project
+        session_validate.enqueue_job(str(tmp_path), str(transcript), "check")
+        real_drain = session_validate._drain_claimed_jobs
+        calls = []
+
+        def drain_then_late_enqueue(*args):
+            done = real_drain(*args)
+            if not calls:
+                # A hook appends after the queue was found empty; its worker sees the lock and exits
+                session_validate.enqueue_job(str(tmp_path), str(transcript), "update")
+            calls.append(done)
+            return done
+
+        monkeypatch.setattr(session_validate, "_drain_claimed_jobs", drain_then_late_enqueue)
+        assert session_validate.drain_queue(str(tmp_path)) == 2
+        assert calls == [1, 1]
+        assert not (tmp_path / ".retro" / session_validate.QUEUE_FILE).exists()
+
+    def test_long_drain_keeps_lock_fresh(self, project, monkeypatch):
+        tmp_path, transcript, _ = project
+        other = tmp_path / "def.jsonl"
+        other.write_text(user_line(SESSION))
+        session_validate.enqueue_job(str(tmp_path), str(transcript), "check")
+        session_validate.enqueue_job(str(tmp_path), str(other), "check")
+        lock = tmp_path / ".retro" / session_validate.DRAIN_LOCK_FILE
+        stolen = []
+
+        def slow_validate(project_dir, session_file, mode):
+            if session_file == str(transcript):
+                os.utime(lock, (0, 0))  # the first job ran past DRAIN_LOCK_STALE_SECONDS
+            else:
+                stolen.append(session_validate._acquire_drain_lock(lock))
+            return None
+
+        monkeypatch.setattr(session_validate, "validate_session", slow_validate)
+        assert session_validate.drain_queue(str(tmp_path)) == 2
+        assert stolen == [False]
+
+    def test_without_retro_runs_synchronously(self, tmp_path, monkeypatch):
+        make_memory(tmp_path)
+        transcript = tmp_path / "abc.jsonl"
+        transcript.write_text(user_line(SESSION))
+        monkeypatch.setattr(session_validate, "SCAN_BYTES_PER_MS", 1)
+        result = session_validate.run_hook(str(tmp_path), str(transcript), "update", 1)
+        assert len(result["triggered_assets"]) == 3
+        genes = {g["id"]: g for g in json.loads((tmp_path / "memory" / "genes.json").read_text())}
+        assert genes["g-test"]["confidence"] == 0.92